@@ -0,0 +1,398 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import threading
+
+import zstandard
+
+from frontier import canonicalize_url
+
+# Storage backends for extracted articles.
+# FileArticleStore keeps the original layout of one pretty-printed JSON file
+# per article, plus an append-only index from URL to file name, since some
+# sources name files after the publication date rather than the URL.
+# SegmentArticleStore appends records to size-rolled,
+# zstd-compressed JSONL segments: records are buffered and written as one
+# zstd frame per batch, each segment has a sidecar index mapping URL to
+# (frame offset, frame length, line), and fsync is batched. Every process
+# writes its own segments, so several workers can share one store; each
+# picks up the others' records from their sidecars on a lookup miss.
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_BATCH_RECORDS = 64
+DEFAULT_FSYNC_EVERY = 8
+COMPRESSION_LEVEL = 6
+
+# segment-000001 (older single-writer stores) or segment-000002-<pid>
+SEGMENT_PATTERN = re.compile(r'segment-(\d{6})(?:-(\d+))?\.jsonl\.zst$')
+FILE_INDEX = 'url-index.jsonl'
+
+
+class FileArticleStore:
+    def __init__(self, root, filename_fn, indent=2):
+        self.root = root
+        self.filename_fn = filename_fn
+        self.indent = indent
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._index = {}
+        self._index_offset = 0
+        self._load_index()
+        self._index_unlisted()
+
+    def _index_path(self):
+        return os.path.join(self.root, FILE_INDEX)
+
+    # Reads entries appended since the last call, including those of other
+    # processes writing to the same directory
+    def _load_index(self):
+        path = self._index_path()
+        if not os.path.exists(path) or os.path.getsize(path) <= self._index_offset:
+            return
+        with open(path, 'rb') as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # A line still being written is picked up by the next call
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._index[entry['url']] = entry['file']
+        self._index_offset += end
+
+    # Files saved before the index existed
+    def _index_unlisted(self):
+        listed = set(self._index.values())
+        for path in sorted(glob.glob(os.path.join(self.root, '*.json'))):
+            filename = os.path.basename(path)
+            if filename in listed:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    url = json.load(f).get('url')
+            except (IOError, ValueError, AttributeError):
+                continue
+            if url:
+                self._add(url, filename)
+
+    def _add(self, url, filename):
+        key = canonicalize_url(url)
+        if self._index.get(key) == filename:
+            return
+        with open(self._index_path(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'url': key, 'file': filename}) + '\n')
+        self._index[key] = filename
+
+    def _stored_path(self, url):
+        key = canonicalize_url(url)
+        with self._lock:
+            if key not in self._index:
+                self._load_index()
+            filename = self._index.get(key)
+        return os.path.join(self.root, filename) if filename else None
+
+    # An article already stored keeps its file, wherever filename_fn would put it now
+    def path_for(self, url, record=None):
+        return self._stored_path(url) or os.path.join(self.root, self.filename_fn(url, record))
+
+    def contains(self, url):
+        path = self._stored_path(url)
+        return path is not None and os.path.exists(path)
+
+    def get(self, url):
+        path = self._stored_path(url)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    # `filename` overrides filename_fn for callers that name files themselves
+    def save(self, url, record, filename=None):
+        path = os.path.join(self.root, filename) if filename else self.path_for(url, record)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=self.indent)
+        with self._lock:
+            self._add(url, os.path.relpath(path, self.root))
+        return path
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SegmentArticleStore:
+    def __init__(self, root, max_segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 batch_records=DEFAULT_BATCH_RECORDS, fsync_every=DEFAULT_FSYNC_EVERY):
+        self.root = root
+        self.max_segment_bytes = max_segment_bytes
+        self.batch_records = batch_records
+        self.fsync_every = fsync_every
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+        self._buffer = []
+        self._unsynced = 0
+        # canonical URL -> (segment name, frame offset, frame length, line)
+        self._index = {}
+        # Bytes of each sidecar already read into the index
+        self._sidecar_read = {}
+        # This process's segment, opened on the first write
+        self._segment = None
+        self._data = None
+        self._sidecar = None
+
+        self._load_index()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.root, f'{segment}.jsonl.zst')
+
+    def _index_path(self, segment):
+        return os.path.join(self.root, f'{segment}.idx')
+
+    def _segments(self):
+        segments = []
+        for path in glob.glob(os.path.join(self.root, 'segment-*.jsonl.zst')):
+            match = SEGMENT_PATTERN.search(path)
+            if match:
+                name = os.path.basename(path)[:-len('.jsonl.zst')]
+                segments.append((int(match.group(1)), int(match.group(2) or 0), name))
+        return sorted(segments)
+
+    # Reads the sidecar entries written since the last call, including those
+    # of other processes appending to their own segments in the same store
+    def _load_index(self):
+        loaded = 0
+        for _, _, segment in self._segments():
+            index_path = self._index_path(segment)
+            if not os.path.exists(index_path):
+                continue
+            read = self._sidecar_read.get(segment, 0)
+            if os.path.getsize(index_path) <= read:
+                continue
+            size = os.path.getsize(self._segment_path(segment))
+            with open(index_path, 'rb') as f:
+                f.seek(read)
+                data = f.read()
+            # A line still being written is picked up by the next call
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash; the frame it points to is ignored
+                    continue
+                if entry['offset'] + entry['length'] > size:
+                    continue
+                self._index[entry['url']] = (segment, entry['offset'], entry['length'], entry['line'])
+                loaded += 1
+            self._sidecar_read[segment] = read + end
+        if loaded:
+            logging.debug(f"Loaded {loaded} index entries from {self.root}")
+
+    # Segments are per process (the pid is in the name), so frame offsets
+    # taken from this process's own append handle are always right
+    def _open_segment(self):
+        self._close_files()
+        last = max((segment_id for segment_id, _, _ in self._segments()), default=0)
+        self._segment = f'segment-{last + 1:06d}-{os.getpid()}'
+        self._data = open(self._segment_path(self._segment), 'ab')
+        self._sidecar = open(self._index_path(self._segment), 'a', encoding='utf-8')
+
+    def _close_files(self):
+        for f in (self._data, self._sidecar):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        self._data = None
+        self._sidecar = None
+
+    def _lookup(self, key):
+        if key not in self._index:
+            self._load_index()
+        return self._index.get(key)
+
+    def contains(self, url):
+        key = canonicalize_url(url)
+        with self._lock:
+            return any(k == key for k, _ in self._buffer) or self._lookup(key) is not None
+
+    def save(self, url, record, filename=None):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._buffer.append((canonicalize_url(url), line))
+            if len(self._buffer) >= self.batch_records:
+                self._write_frame()
+            return self._segment_path(self._segment) if self._segment else self.root
+
+    def _write_frame(self):
+        if not self._buffer:
+            return
+        payload = ('\n'.join(line for _, line in self._buffer) + '\n').encode('utf-8')
+        frame = self._compressor.compress(payload)
+
+        if self._data is None or (self._data.tell() > 0 and self._data.tell() + len(frame) > self.max_segment_bytes):
+            self._open_segment()
+
+        offset = self._data.tell()
+        self._data.write(frame)
+        self._data.flush()
+        for line_number, (key, _) in enumerate(self._buffer):
+            self._sidecar.write(json.dumps({
+                'url': key, 'offset': offset, 'length': len(frame), 'line': line_number
+            }) + '\n')
+            self._index[key] = (self._segment, offset, len(frame), line_number)
+        self._sidecar.flush()
+        self._sidecar_read[self._segment] = self._sidecar.tell()
+        self._buffer = []
+
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _read_frame(self, segment, offset, length):
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            frame = f.read(length)
+        # Decompressors are not thread safe, so each read gets its own
+        return zstandard.ZstdDecompressor().decompress(frame).decode('utf-8').split('\n')
+
+    def _sync(self):
+        if self._data is not None:
+            os.fsync(self._data.fileno())
+            os.fsync(self._sidecar.fileno())
+        self._unsynced = 0
+
+    def flush(self):
+        with self._lock:
+            self._write_frame()
+            self._sync()
+
+    def get(self, url):
+        key = canonicalize_url(url)
+        with self._lock:
+            for buffered_key, line in reversed(self._buffer):
+                if buffered_key == key:
+                    return json.loads(line)
+            location = self._lookup(key)
+        if location is None:
+            return None
+        segment, offset, length, line_number = location
+        return json.loads(self._read_frame(segment, offset, length)[line_number])
+
+    # Latest version of every stored record
+    def iter_records(self):
+        self.flush()
+        with self._lock:
+            self._load_index()
+            locations = sorted(set((s, o, l) for s, o, l, _ in self._index.values()))
+            current = set(self._index.values())
+        for segment, offset, length in locations:
+            lines = self._read_frame(segment, offset, length)
+            for line_number, line in enumerate(lines):
+                if line and (segment, offset, length, line_number) in current:
+                    yield json.loads(line)
+
+    def __len__(self):
+        with self._lock:
+            self._load_index()
+            return len(self._index)
+
+    def close(self):
+        with self._lock:
+            self._write_frame()
+            self._close_files()
+
+
+def open_store(kind, root, filename_fn=None, indent=2):
+    if kind == 'files':
+        return FileArticleStore(root, filename_fn, indent=indent)
+    if kind == 'segments':
+        return SegmentArticleStore(root)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+# Copy a directory of per-article JSON files into a segment store
+def migrate(source_dir, dest_dir, delete=False):
+    store = SegmentArticleStore(dest_dir)
+    migrated = 0
+    skipped = 0
+    try:
+        for path in sorted(glob.glob(os.path.join(source_dir, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (IOError, ValueError) as e:
+                logging.error(f"Skipping unreadable {path}: {str(e)}")
+                skipped += 1
+                continue
+
+            url = record.get('url')
+            if not url:
+                logging.error(f"Skipping {path}: no url field")
+                skipped += 1
+                continue
+            if not store.contains(url):
+                store.save(url, record)
+            migrated += 1
+        store.flush()
+
+        # Only remove originals once everything is durable in the new store
+        if delete:
+            for path in sorted(glob.glob(os.path.join(source_dir, '*.json'))):
+                with open(path, 'r', encoding='utf-8') as f:
+                    try:
+                        url = json.load(f).get('url')
+                    except ValueError:
+                        continue
+                if url and store.contains(url):
+                    os.remove(path)
+    finally:
+        store.close()
+
+    logging.info(f"Migrated {migrated} articles from {source_dir} to {dest_dir} ({skipped} skipped)")
+    return migrated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Manage segmented article stores')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='convert a per-file article directory')
+    migrate_parser.add_argument('source_dir')
+    migrate_parser.add_argument('dest_dir')
+    migrate_parser.add_argument('--delete', action='store_true',
+                                help='remove the original files after migrating')
+
+    get_parser = subparsers.add_parser('get', help='print one stored article')
+    get_parser.add_argument('store_dir')
+    get_parser.add_argument('url')
+
+    count_parser = subparsers.add_parser('count', help='number of articles in a store')
+    count_parser.add_argument('store_dir')
+
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        migrate(args.source_dir, args.dest_dir, delete=args.delete)
+    elif args.command == 'get':
+        store = SegmentArticleStore(args.store_dir)
+        print(json.dumps(store.get(args.url), ensure_ascii=False, indent=2))
+        store.close()
+    elif args.command == 'count':
+        store = SegmentArticleStore(args.store_dir)
+        print(len(store))
+        store.close()
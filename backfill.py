@@ -0,0 +1,258 @@
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import re
+import time
+from datetime import date, datetime
+
+import http_client
+from discovery import FeedDiscovery
+from extraction_engine import run_extractions, DEFAULT_TIMEOUT
+from frontier import Frontier, EXTRACTED, FAILED, DEFAULT_PATH as DEFAULT_FRONTIER_PATH
+from html_archive import configure_archive, DEFAULT_ARCHIVE_DIR, EXTRACTORS
+from rate_control import RateController
+
+# Date-range backfill of historical articles.
+# The full-history sitemaps are walked once for the requested range and the
+# matching article URLs are split into partitions (one per day, or per day
+# and section). Each partition is a checkpoint in the crawl-state store that
+# holds its URL list and goes from `listed` to `done` once every article in
+# it was extracted (or ran out of attempts), so an interrupted backfill
+# resumes at the first unfinished partition. Partitions are spread over worker processes; each
+# fetches and extracts on its own threads with the scraper's backfill hook
+# (`fetch_article_record(url)`) and a share of the per-domain rate limits,
+# while the parent process alone writes the article store and crawl state.
+
+BACKFILL_SOURCES = {
+    'coindesk': {
+        'sitemaps': ['https://www.coindesk.com/arc/outboundfeeds/sitemap-index/?outputType=xml'],
+        'sections': ('markets', 'business', 'tech', 'opinion'),
+        # Articles the static extractor misses are failures
+        'needs_browser': False,
+    },
+    'cointelegraph': {
+        'sitemaps': ['https://cointelegraph.com/sitemap.xml'],
+        'sections': None,
+        # Pages that need rendering stay pending for the spider's browser tier
+        'needs_browser': True,
+    },
+}
+
+DEFAULT_PROCESSES = 2
+DEFAULT_THREADS = 4
+
+CHECKPOINT_PREFIX = 'backfill/'
+LISTED = 'listed'
+DONE = 'done'
+
+# CoinDesk URLs carry their section and publication day: /markets/2024/05/01/slug/
+URL_DATE_PATTERN = re.compile(r'^/([^/]+)/(\d{4})/(\d{2})/(\d{2})/')
+
+
+def parse_day(value):
+    return date.fromisoformat(value)
+
+
+# Section and publication day of an article URL; the sitemap date stands in
+# where the URL has none
+def url_section_and_day(url, entry_date=None):
+    path = '/' + url.split('://', 1)[-1].partition('/')[2]
+    match = URL_DATE_PATTERN.match(path)
+    if match:
+        section, year, month, day = match.groups()
+        return section, date(int(year), int(month), int(day))
+    section = path.strip('/').split('/', 1)[0] or None
+    return section, entry_date.date() if entry_date else None
+
+
+# Sitemap walk limited to a date range. Child sitemaps whose lastmod predates
+# the range are skipped; undated ones are followed.
+class RangeListing(FeedDiscovery):
+    def __init__(self, source, start, end):
+        super().__init__(source, frontier=None)
+        self.start = start
+        self.end = end
+        self.entry_dates = {}
+
+    def _wanted(self, kind, url, entry_date):
+        if kind == 'sitemap':
+            return entry_date is None or entry_date.date() >= self.start
+        _, day = url_section_and_day(url, entry_date)
+        if day is None or not (self.start <= day <= self.end):
+            return False
+        self.entry_dates[url] = entry_date
+        return True
+
+    # Article URLs in the range as {url: (section, day)}
+    def run(self):
+        urls = []
+        ok = True
+        for sitemap in BACKFILL_SOURCES[self.source]['sitemaps']:
+            sitemap_urls, sitemap_ok = self.read_feed(sitemap)
+            urls.extend(sitemap_urls)
+            ok = ok and sitemap_ok
+        found = {url: url_section_and_day(url, self.entry_dates.get(url)) for url in dict.fromkeys(urls)}
+        return found, ok
+
+
+def partition_name(source, day, section=None):
+    name = f'{CHECKPOINT_PREFIX}{source}/{day.isoformat()}'
+    return f'{name}/{section}' if section else name
+
+
+def _listing_name(source, start, end, partition):
+    return f'{CHECKPOINT_PREFIX}{source}/listing/{start.isoformat()}/{end.isoformat()}/{partition}'
+
+
+# Split the range into partitions and record them as `listed` checkpoints.
+# Partitions already in the store keep their state, and the listing itself
+# is only done once per range, so a resumed backfill goes straight to work.
+def plan_partitions(source, frontier, start, end, partition='day', sections=None):
+    listing = _listing_name(source, start, end, partition)
+    names = []
+    if frontier.checkpoint(listing) is None:
+        found, ok = RangeListing(source, start, end).run()
+        groups = {}
+        for url, (section, day) in found.items():
+            if sections and section not in sections:
+                continue
+            name = partition_name(source, day, section if partition == 'section' else None)
+            groups.setdefault(name, []).append(url)
+
+        existing = frontier.checkpoints(f'{CHECKPOINT_PREFIX}{source}/')
+        frontier.discover_many([url for urls in groups.values() for url in urls], source)
+        for name, urls in sorted(groups.items()):
+            if name not in existing:
+                frontier.set_checkpoint(name, json.dumps({'state': LISTED, 'urls': urls}))
+        if ok:
+            frontier.set_checkpoint(listing, json.dumps(sorted(groups)))
+        else:
+            logging.warning(f"Some {source} sitemaps could not be read; the listing will be redone next run")
+        names = sorted(groups)
+    else:
+        names = json.loads(frontier.checkpoint(listing))
+
+    partitions = []
+    for name in names:
+        value = json.loads(frontier.checkpoint(name))
+        if value['state'] != DONE:
+            partitions.append((name, value['urls']))
+    logging.info(f"{source}: {len(partitions)} of {len(names)} partitions left between {start} and {end}")
+    return partitions
+
+
+def _init_worker(share, archive_dir, source):
+    # Every process paces itself with 1/processes of each domain's limits
+    http_client.configure_rate_control(RateController(share=share))
+    if archive_dir:
+        configure_archive(archive_dir, prefix=f'{source}-backfill')
+
+
+# Runs in a worker process: fetch and extract the given URLs of one partition
+def _backfill_partition(job):
+    source, name, urls, threads, timeout = job
+    extractor = importlib.import_module(EXTRACTORS[source])
+    try:
+        records = run_extractions(urls, extractor.fetch_article_record, max_workers=threads, timeout=timeout)
+    finally:
+        http_client.close_session()
+    return name, list(zip(urls, records))
+
+
+def backfill(source, start, end, frontier_path=DEFAULT_FRONTIER_PATH, storage='files', output_dir=None,
+             partition='day', sections=None, processes=DEFAULT_PROCESSES, threads=DEFAULT_THREADS,
+             timeout=DEFAULT_TIMEOUT, archive_dir=DEFAULT_ARCHIVE_DIR):
+    config = BACKFILL_SOURCES[source]
+    if config['sections'] is None:
+        sections = None
+    elif sections is None:
+        sections = config['sections']
+
+    frontier = Frontier(frontier_path)
+    store = importlib.import_module(EXTRACTORS[source]).open_article_store(storage, output_dir)
+    counts = {'partitions': 0, 'extracted': 0, 'failed': 0, 'deferred': 0, 'skipped': 0}
+    started = time.monotonic()
+
+    try:
+        partitions = plan_partitions(source, frontier, start, end, partition, sections)
+
+        # Articles finished by earlier runs or the regular crawl are not refetched
+        jobs = []
+        for name, urls in partitions:
+            todo = [url for url in urls if frontier.should_fetch(url) and not store.contains(url)]
+            counts['skipped'] += len(urls) - len(todo)
+            jobs.append((source, name, todo, threads, timeout))
+
+        # Spawned rather than forked, like the extraction engine's process pool
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes, initializer=_init_worker,
+                          initargs=(1 / processes, archive_dir, source)) as pool:
+            for name, results in pool.imap_unordered(_backfill_partition, jobs):
+                updates = []
+                extracted = 0
+                failed = 0
+                for url, record in results:
+                    if record:
+                        store.save(url, record)
+                        updates.append((url, EXTRACTED, None))
+                        extracted += 1
+                    elif config['needs_browser']:
+                        counts['deferred'] += 1
+                    else:
+                        updates.append((url, FAILED, 'no content extracted'))
+                        failed += 1
+                store.flush()
+                frontier.update_many(updates)
+                counts['extracted'] += extracted
+                counts['failed'] += failed
+
+                # Failed articles are retried next run until their attempts run out
+                value = json.loads(frontier.checkpoint(name))
+                value.update(state=DONE if not failed else LISTED, extracted=value.get('extracted', 0) + extracted)
+                frontier.set_checkpoint(name, json.dumps(value))
+                counts['partitions'] += 1
+                logging.info(f"Backfilled {name}: {extracted}/{len(results)} articles extracted, {failed} failed")
+    finally:
+        store.close()
+        logging.info(f"Crawl state: {frontier.counts(source)}")
+        frontier.close()
+
+    logging.info(f"Backfill of {source} {start}..{end} finished in {time.monotonic() - started:.1f}s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Backfill articles published in a date range')
+    parser.add_argument('--start', type=parse_day, required=True, help='first publication day (YYYY-MM-DD)')
+    parser.add_argument('--end', type=parse_day, default=None, help='last publication day (default: today)')
+    parser.add_argument('--sources', nargs='+', choices=sorted(BACKFILL_SOURCES), default=['coindesk'])
+    parser.add_argument('--partition', choices=['day', 'section'], default='day',
+                        help='checkpoint per day, or per day and section')
+    parser.add_argument('--sections', nargs='+', default=None,
+                        help='CoinDesk sections to include (default: markets business tech opinion)')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='worker processes, each taking whole partitions')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help='articles fetched in parallel within a worker process')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='seconds allowed per article before giving up')
+    parser.add_argument('--storage', choices=['files', 'segments'], default='files')
+    parser.add_argument('--output-dir', help='defaults to the scraper\'s own output directory')
+    parser.add_argument('--state', default=DEFAULT_FRONTIER_PATH, help='crawl-state database')
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR,
+                        help='keep the raw HTML of every fetched page here')
+    parser.add_argument('--no-archive', action='store_true', help='do not keep raw HTML')
+    args = parser.parse_args()
+
+    end = args.end or datetime.utcnow().date()
+    if end < args.start:
+        parser.error('--end is before --start')
+    for source in args.sources:
+        backfill(source, args.start, end, frontier_path=args.state, storage=args.storage,
+                 output_dir=args.output_dir, partition=args.partition, sections=args.sections,
+                 processes=max(1, args.processes), threads=args.threads, timeout=args.timeout,
+                 archive_dir=None if args.no_archive else args.archive_dir)
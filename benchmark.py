@@ -0,0 +1,385 @@
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from html_archive import archive_files, iter_records
+
+# Offline benchmarks for the crawl and extraction hot paths.
+# Article and listing pages are served from a local replay server, either
+# recorded pages from a raw HTML archive (html_archive.py) or synthetic
+# pages shaped like the real sites. Each benchmark runs in its own spawned
+# process against that server, so peak RSS is per benchmark and Scrapy's
+# reactor starts fresh. It reports pages per second and the per-stage
+# latencies from instrumentation.py. Results are written as JSON, and
+# --compare prints the change against an earlier results file.
+
+DEFAULT_PAGES = 200
+DEFAULT_LISTING_PAGES = 20
+DEFAULT_WORKERS = 8
+DEFAULT_PROCESSES = 2
+DEFAULT_RESULTS_DIR = 'benchmark_results'
+
+BENCHMARKS = (
+    'coindesk_spider',
+    'coindesk_extract',
+    'coindesk_pipeline',
+    'coindesk_parse',
+    'cointelegraph_http',
+    'cointelegraph_parse',
+)
+
+WORDS = (
+    'bitcoin ether market traders price rally funds exchange token network '
+    'regulators liquidity volatility futures options investors blockchain '
+    'stablecoin protocol yield custody etf inflows outflows analysts week'
+).split()
+
+
+def _sentence(rng, words=18):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _boilerplate(rng, links=60):
+    nav = ''.join(f'<li><a href="/tag/{rng.choice(WORDS)}-{i}/">{rng.choice(WORDS)}</a></li>' for i in range(links))
+    return f'<header><nav><ul>{nav}</ul></nav></header>'
+
+
+def coindesk_article(rng, path):
+    paragraphs = ''.join(f'<p>{_sentence(rng)} {_sentence(rng)}</p>' for _ in range(rng.randint(12, 30)))
+    return f"""<!DOCTYPE html><html><head><title>{_sentence(rng, 8)}</title>
+<meta property="og:title" content="{_sentence(rng, 8)}"><script>{'var x=1;' * 400}</script></head>
+<body>{_boilerplate(rng)}<main><article>
+<h1 class="at-headline">{_sentence(rng, 10)}</h1>
+<div class="at-created"><span class="iOUkmj">May 1, 2024 at 9:15 a.m. UTC</span></div>
+<div class="at-updated"><span class="iOUkmj">Updated May 1, 2024 at 11:02 a.m. UTC</span></div>
+<a href="/author/{rng.choice(WORDS)}/">{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}</a>
+<p class="kDZZDY">Edited by {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}.</p>
+{paragraphs}</article></main>{_boilerplate(rng, 40)}</body></html>"""
+
+
+def cointelegraph_article(rng, path):
+    paragraphs = ''.join(f'<p>{_sentence(rng)} {_sentence(rng)}</p>' for _ in range(rng.randint(12, 30)))
+    author = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}'
+    ldjson = json.dumps({'@type': 'NewsArticle', 'author': {'@type': 'Person', 'name': author}})
+    counter = '<div><span class="text-black text-13 font-semibold">{}</span><span class="text-13 text-custom-coh-gray-dark font-light">{}</span></div>'
+    return f"""<!DOCTYPE html><html><head><title>{_sentence(rng, 8)}</title>
+<script type="application/ld+json" data-hid="ldjson-schema">{ldjson}</script><script>{'var y=2;' * 400}</script></head>
+<body>{_boilerplate(rng)}<article><h1 class="post__title">{_sentence(rng, 10)}</h1>
+<time class="post-meta__publish-date">May 01, 2024</time>
+{counter.format(rng.randint(100, 90000), 'Total views')}{counter.format(rng.randint(1, 900), 'Total shares')}
+<div class="post__content"><p class="post__lead">{_sentence(rng)}</p>{paragraphs}</div>
+</article>{_boilerplate(rng, 40)}</body></html>"""
+
+
+def article_paths(source, count):
+    if source == 'coindesk':
+        sections = ('markets', 'business', 'tech', 'opinion', 'policy')
+        return [f'/{sections[i % len(sections)]}/2024/05/{1 + i % 28:02d}/benchmark-story-{i}/' for i in range(count)]
+    return [f'/news/benchmark-story-{i}' for i in range(count)]
+
+
+# Listing pages linking to every article, spread across `count` pages
+def listing_pages(rng, paths, count):
+    pages = {}
+    per_page = max(1, -(-len(paths) // count))
+    for i in range(count):
+        links = ''.join(f'<div class="card"><a href="{path}">{_sentence(rng, 8)}</a></div>'
+                        for path in paths[i * per_page:(i + 1) * per_page])
+        pages['/' if i == 0 else f'/?page={i}'] = (
+            f'<!DOCTYPE html><html><head><title>Listing</title></head><body>{_boilerplate(rng)}'
+            f'<main>{links}</main></body></html>'
+        )
+    return pages
+
+
+# {path: html} for one source: synthetic pages, or the archived ones
+def build_fixtures(source, pages=DEFAULT_PAGES, listing_count=DEFAULT_LISTING_PAGES, archive=None, seed=1):
+    rng = random.Random(seed)
+    if archive:
+        fixtures = {}
+        for headers, html in iter_records(archive_files(archive), source):
+            parts = urlsplit(headers['WARC-Target-URI'])
+            fixtures[parts.path + (f'?{parts.query}' if parts.query else '')] = html
+            if len(fixtures) >= pages:
+                break
+        if not fixtures:
+            raise ValueError(f"No {source} pages in archive {archive}")
+    else:
+        make = coindesk_article if source == 'coindesk' else cointelegraph_article
+        fixtures = {path: make(rng, path) for path in article_paths(source, pages)}
+    articles = list(fixtures)
+    fixtures.update(listing_pages(rng, articles, listing_count))
+    return fixtures, articles
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.server.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serves recorded pages by path on 127.0.0.1 from a background thread
+class ReplayServer:
+    def __init__(self, pages):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.pages = {path: html.encode('utf-8') for path, html in pages.items()}
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_port}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='replay', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _bench_coindesk_spider(base_url, paths, listings, options, workdir):
+    from scrapy.crawler import CrawlerProcess
+    from scrape_coindesk import GeneralSpider
+    process = CrawlerProcess(settings={
+        'LOG_LEVEL': 'WARNING',
+        'TELNETCONSOLE_ENABLED': False,
+        'ROBOTSTXT_OBEY': False,
+        'CONCURRENT_REQUESTS': 16,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 16,
+    })
+    process.crawl(GeneralSpider, frontier_path=os.path.join(workdir, 'crawl_state.db'),
+                  start_urls=[base_url + path for path in listings], allowed_domains=['127.0.0.1'])
+    process.start()
+    return len(listings)
+
+
+def _bench_coindesk_extract(base_url, paths, listings, options, workdir):
+    from extraction_engine import run_extractions
+    from scrape_coindesk import extract_content
+    results = run_extractions([base_url + path for path in paths], extract_content, max_workers=options['workers'])
+    return sum(1 for result in results if result)
+
+
+def _bench_coindesk_pipeline(base_url, paths, listings, options, workdir):
+    from extraction_engine import run_pipeline
+    from scrape_coindesk import fetch_article, parse_article
+    results = run_pipeline([base_url + path for path in paths], fetch_article, parse_article,
+                           max_workers=options['workers'], processes=options['processes'])
+    return sum(1 for result in results if result)
+
+
+def _bench_coindesk_parse(base_url, paths, listings, options, workdir):
+    import http_client
+    from instrumentation import metrics
+    from scrape_coindesk import parse_article
+    # Download first so only the CPU stage is measured
+    pages = [(path, http_client.fetch(base_url + path).text) for path in paths]
+    metrics.drain()
+    return sum(1 for path, html in pages if parse_article(base_url + path, (html, None)))
+
+
+def _bench_cointelegraph_http(base_url, paths, listings, options, workdir):
+    from extraction_engine import run_extractions
+    from scrape_cointelegraph import fetch_article_record
+    results = run_extractions([base_url + path for path in paths], fetch_article_record,
+                              max_workers=options['workers'])
+    return sum(1 for result in results if result)
+
+
+def _bench_cointelegraph_parse(base_url, paths, listings, options, workdir):
+    import http_client
+    from instrumentation import metrics
+    from scrape_cointelegraph import extract_content_from_html, article_record
+    pages = [(path, http_client.fetch(base_url + path).text) for path in paths]
+    metrics.drain()
+    parsed = 0
+    for path, html in pages:
+        with metrics.timer('parse'):
+            article_data, missing = extract_content_from_html(base_url + path, html)
+            if article_data.get('text'):
+                article_record(article_data)
+                parsed += 1
+    return parsed
+
+
+# Runs in a fresh process: one benchmark against the replay server
+def _run_one(conn, name, base_url, paths, listings, options):
+    # At the default WARNING, log I/O does not dominate the numbers
+    logging.basicConfig(level=options['log_level'], format='%(asctime)s [%(levelname)s] %(message)s')
+    try:
+        import http_client
+        from instrumentation import metrics
+        importlib.import_module('scrape_coindesk' if name.startswith('coindesk') else 'scrape_cointelegraph')
+        http_client.configure_session(pool_maxsize=options['workers'])
+        bench = globals()[f'_bench_{name}']
+
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as workdir:
+            metrics.drain()
+            started = time.perf_counter()
+            pages = bench(base_url, paths, listings, options, workdir)
+            elapsed = time.perf_counter() - started
+        conn.send({
+            'pages': pages,
+            'seconds': round(elapsed, 3),
+            'pages_per_second': round(pages / elapsed, 2) if elapsed else None,
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': metrics.summary()['stages'],
+        })
+    except Exception as e:
+        logging.exception(f"Benchmark {name} failed")
+        conn.send({'error': str(e)})
+    finally:
+        conn.close()
+
+
+# Not a Pool: pool workers are daemonic and could not start the pipeline's
+# parser processes
+def _run_in_process(context, name, base_url, paths, listings, options):
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_one, args=(sender, name, base_url, paths, listings, options))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {'error': f'process exited with code {process.exitcode}'}
+    process.join()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=BENCHMARKS, pages=DEFAULT_PAGES, listing_count=DEFAULT_LISTING_PAGES,
+                   archive=None, workers=DEFAULT_WORKERS, processes=DEFAULT_PROCESSES, log_level='WARNING'):
+    options = {'workers': workers, 'processes': processes, 'log_level': log_level}
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for source in ('coindesk', 'cointelegraph'):
+        selected = [name for name in names if name.startswith(source)]
+        if not selected:
+            continue
+        fixtures, paths = build_fixtures(source, pages, listing_count, archive)
+        listings = [path for path in fixtures if path not in set(paths)]
+        with ReplayServer(fixtures) as server:
+            for name in selected:
+                logging.info(f"Running {name} on {len(paths)} pages")
+                results[name] = _run_in_process(context, name, server.base_url, paths, listings, options)
+                if 'error' in results[name]:
+                    logging.error(f"{name} failed: {results[name]['error']}")
+                else:
+                    logging.info(f"{name}: {results[name]['pages_per_second']} pages/s, "
+                                 f"peak RSS {results[name]['peak_rss_mb']} MiB")
+    return {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'fixtures': archive or 'synthetic',
+        'options': dict(options, pages=pages, listing_pages=listing_count),
+        'results': results,
+    }
+
+
+def _change(new, old):
+    if new is None or not old:
+        return ''
+    return f'{100 * (new - old) / old:+.1f}%'
+
+
+# Print pages/s, peak RSS and per-stage p95 next to an earlier run
+def compare(current, baseline):
+    lines = [f"Against {baseline.get('revision')} ({baseline.get('started')}):"]
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if 'error' in result:
+            lines.append(f"  {name}: failed ({result['error']})")
+            continue
+        if old is None or 'error' in old:
+            lines.append(f"  {name}: no baseline")
+            continue
+        lines.append(f"  {name}: {result['pages_per_second']} pages/s ({_change(result['pages_per_second'], old['pages_per_second'])}), "
+                     f"peak RSS {result['peak_rss_mb']} MiB ({_change(result['peak_rss_mb'], old['peak_rss_mb'])})")
+        for stage, entry in result['stages'].items():
+            old_entry = old['stages'].get(stage)
+            if old_entry:
+                lines.append(f"    {stage}: p95 {entry['p95']}s ({_change(entry['p95'], old_entry['p95'])})")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Benchmark crawling and extraction against a local replay server')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help='article pages per source')
+    parser.add_argument('--listing-pages', type=int, default=DEFAULT_LISTING_PAGES,
+                        help='listing pages the spider benchmark crawls')
+    parser.add_argument('--archive', default=None,
+                        help='replay recorded pages from this raw HTML archive instead of synthetic ones')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='fetch threads')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES, help='parser processes for the pipeline')
+    parser.add_argument('--log-level', default='WARNING', help='log level inside the benchmark processes')
+    parser.add_argument('--output-dir', default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    args = parser.parse_args()
+    unknown = sorted(set(args.benchmarks) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    report = run_benchmarks(args.benchmarks or BENCHMARKS, pages=args.pages, listing_count=args.listing_pages,
+                            archive=args.archive, workers=args.workers, processes=args.processes,
+                            log_level=args.log_level.upper())
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Results saved to {path}")
+
+    for name, result in report['results'].items():
+        if 'error' in result:
+            print(f"{name}: failed ({result['error']})")
+            continue
+        print(f"{name}: {result['pages']} pages in {result['seconds']}s, "
+              f"{result['pages_per_second']} pages/s, peak RSS {result['peak_rss_mb']} MiB")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print(compare(report, json.load(f)))
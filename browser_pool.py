@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+# Pool of long-lived browser instances for rendering article pages.
+# Browsers are checked out for one page at a time and returned afterwards.
+# A browser is health-checked on the way in and out, and replaced after
+# `max_pages` pages, when its process tree grows past `max_rss_mb`, or when
+# it stops responding.
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_PAGES = 50
+DEFAULT_MAX_RSS_MB = 1500
+LAUNCH_RETRIES = 3
+
+
+class PooledBrowser:
+    def __init__(self, driver, browser_id):
+        self.driver = driver
+        self.browser_id = browser_id
+        self.pages = 0
+        self.started = time.monotonic()
+
+
+class BrowserPool:
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, max_pages=DEFAULT_MAX_PAGES,
+                 max_rss_mb=DEFAULT_MAX_RSS_MB, checkout_timeout=300):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._closed = False
+        self._all = {}
+        self.stats = {'launched': 0, 'recycled': 0, 'crashed': 0, 'pages': 0}
+
+        # Start every browser up front so the first pages find them warm
+        for _ in range(self.size):
+            self._idle.put(self._launch())
+
+    def _launch(self):
+        last_error = None
+        for attempt in range(1, LAUNCH_RETRIES + 1):
+            try:
+                driver = self.factory()
+                with self._lock:
+                    self._next_id += 1
+                    browser = PooledBrowser(driver, self._next_id)
+                    self._all[browser.browser_id] = browser
+                    self.stats['launched'] += 1
+                logging.info(f"Launched browser {browser.browser_id}")
+                return browser
+            except Exception as e:
+                last_error = e
+                logging.warning(f"Browser launch attempt {attempt}/{LAUNCH_RETRIES} failed: {str(e)}")
+                time.sleep(attempt)
+        raise RuntimeError(f"Could not launch browser: {last_error}")
+
+    def _quit(self, browser):
+        with self._lock:
+            self._all.pop(browser.browser_id, None)
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logging.debug(f"Error quitting browser {browser.browser_id}: {str(e)}")
+
+    def _is_healthy(self, browser):
+        try:
+            browser.driver.execute_script('return 1')
+            return True
+        except Exception as e:
+            logging.warning(f"Browser {browser.browser_id} failed health check: {str(e)}")
+            return False
+
+    # Resident memory of the browser and all of its child processes, in MB
+    def _rss_mb(self, browser):
+        pid = getattr(browser.driver, 'browser_pid', None)
+        if not pid:
+            service = getattr(browser.driver, 'service', None)
+            process = getattr(service, 'process', None)
+            pid = getattr(process, 'pid', None)
+        if not pid:
+            return 0
+
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0
+
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _replace(self, browser, reason):
+        logging.info(f"Recycling browser {browser.browser_id} after {browser.pages} pages ({reason})")
+        self._quit(browser)
+        return self._launch()
+
+    def checkout(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        try:
+            browser = self._idle.get(timeout=timeout or self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a free browser")
+
+        if not self._is_healthy(browser):
+            self.stats['crashed'] += 1
+            try:
+                browser = self._replace(browser, 'unresponsive')
+            except Exception:
+                # Keep the pool at full size even if the relaunch fails now
+                self._idle.put(browser)
+                raise
+        return browser
+
+    def checkin(self, browser):
+        browser.pages += 1
+        self.stats['pages'] += 1
+
+        if self._closed:
+            self._quit(browser)
+            return
+
+        reason = None
+        if not self._is_healthy(browser):
+            reason = 'crashed'
+            self.stats['crashed'] += 1
+        elif self.max_pages and browser.pages >= self.max_pages:
+            reason = 'page limit'
+        elif self.max_rss_mb:
+            rss = self._rss_mb(browser)
+            if rss > self.max_rss_mb:
+                reason = f'{rss:.0f} MB resident'
+
+        if reason:
+            self.stats['recycled'] += 1
+            try:
+                browser = self._replace(browser, reason)
+            except Exception as e:
+                logging.error(f"Failed to replace browser: {str(e)}")
+                # The dead slot is retried on the next checkout
+        self._idle.put(browser)
+
+    @contextmanager
+    def browser(self, timeout=None):
+        browser = self.checkout(timeout)
+        try:
+            yield browser.driver
+        finally:
+            self.checkin(browser)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            browsers = list(self._all.values())
+        for browser in browsers:
+            self._quit(browser)
+        logging.info(f"Browser pool closed: {self.stats}")
@@ -0,0 +1,435 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from frontier import (
+    Frontier, canonicalize_url, DISCOVERED, FETCHED, EXTRACTED, FAILED, STATES, MAX_ATTEMPTS,
+    DEFAULT_PATH as DEFAULT_FRONTIER_PATH
+)
+
+# Lease-based work queue for running several crawl workers at once.
+# A worker claims a batch of pending URLs under a lease that expires unless
+# the worker keeps sending heartbeats; the URLs of an expired lease (a
+# crashed or hung worker) are claimed again by the next worker that asks.
+# Outcomes are reported against the lease: a result only counts while its
+# URL is still leased to that lease, and it is booked in the same transaction
+# that releases the URL, so every outcome is recorded exactly once even when
+# a slow worker and the one that reclaimed its URLs both finish.
+#
+# SqliteLeaseQueue keeps the leases next to the crawl state in the frontier
+# database, for workers on one machine. RedisLeaseQueue keeps queue, leases
+# and states in Redis (or anything speaking the redis-py API), for workers
+# spread over several machines.
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_NAMESPACE = 'crawl'
+# Heartbeats per lease period, so one missed beat does not lose the lease
+HEARTBEATS_PER_LEASE = 3
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class Lease:
+    def __init__(self, token, worker, source, urls, expires):
+        self.token = token
+        self.worker = worker
+        self.source = source
+        self.urls = urls
+        self.expires = expires
+        # URLs without a reported outcome yet
+        self.open = set(urls)
+
+    def finish(self, urls):
+        self.open.difference_update(urls)
+
+    def __len__(self):
+        return len(self.urls)
+
+
+# Leases stored in the frontier database; the crawl state itself is the queue
+class SqliteLeaseQueue(Frontier):
+    def __init__(self, path=DEFAULT_FRONTIER_PATH, lease_seconds=DEFAULT_LEASE_SECONDS):
+        super().__init__(path)
+        self.lease_seconds = lease_seconds
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                url TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                worker TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS leases_token ON leases (token)')
+
+    def enqueue(self, urls, source=None):
+        return self.discover_many(urls, source)
+
+    # Lease up to `limit` pending URLs that nobody holds, or whose lease expired
+    def claim(self, worker, source=None, limit=DEFAULT_BATCH_SIZE):
+        now = time.time()
+        lease = Lease(uuid.uuid4().hex, worker, source, [], now + self.lease_seconds)
+        query = """
+            SELECT u.url, u.fetch_url, l.url IS NOT NULL FROM urls u
+            LEFT JOIN leases l ON l.url = u.url
+            WHERE (u.state IN (?, ?) OR (u.state = ? AND u.attempts < ?))
+              AND (l.url IS NULL OR l.expires < ?)
+        """
+        params = [DISCOVERED, FETCHED, FAILED, MAX_ATTEMPTS, now]
+        if source:
+            query += ' AND u.source = ?'
+            params.append(source)
+        query += ' ORDER BY u.first_seen LIMIT ?'
+        params.append(limit)
+
+        with self.batch(immediate=True):
+            rows = self._conn.execute(query, params).fetchall()
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO leases (url, token, worker, expires) VALUES (?, ?, ?, ?)',
+                [(key, lease.token, worker, lease.expires) for key, _, _ in rows]
+            )
+        reclaimed = sum(1 for _, _, expired in rows if expired)
+        if reclaimed:
+            logging.warning(f"{worker} reclaimed {reclaimed} URLs from expired leases")
+
+        lease.urls = [fetch_url for _, fetch_url, _ in rows]
+        lease.open = set(lease.urls)
+        return lease
+
+    # Extend the lease; returns how many of its URLs it still holds
+    def heartbeat(self, lease):
+        expires = time.time() + self.lease_seconds
+        with self._lock:
+            held = self._conn.execute(
+                'UPDATE leases SET expires = ? WHERE token = ?', (expires, lease.token)
+            ).rowcount
+        lease.expires = expires
+        return held
+
+    # Book (url, state, error) outcomes; returns the ones that were accepted
+    def complete(self, lease, results):
+        now = time.time()
+        accepted = []
+        with self.batch(immediate=True):
+            for url, state, error in results:
+                if state not in STATES:
+                    raise ValueError(f"Unknown crawl state: {state}")
+                released = self._conn.execute(
+                    'DELETE FROM leases WHERE url = ? AND token = ?', (canonicalize_url(url), lease.token)
+                ).rowcount
+                if released:
+                    self._set_state(url, state, error, now)
+                    accepted.append((url, state, error))
+        _log_rejected(lease, results, accepted)
+        lease.finish(url for url, _, _ in results)
+        return accepted
+
+    # Give unfinished URLs back without waiting for the lease to expire
+    def release(self, lease):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE token = ?', (lease.token,))
+        lease.open.clear()
+
+    def queue_counts(self, source=None):
+        now = time.time()
+        with self._lock:
+            leased, expired = self._conn.execute(
+                'SELECT COALESCE(SUM(expires >= ?), 0), COALESCE(SUM(expires < ?), 0) FROM leases', (now, now)
+            ).fetchone()
+        return {'leased': leased, 'expired': expired, **self.counts(source)}
+
+
+# Queue, leases and crawl states in Redis. Needs a client created with
+# decode_responses=True; any object with the redis-py API will do.
+class RedisLeaseQueue:
+    def __init__(self, client, namespace=DEFAULT_NAMESPACE, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.client = client
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        # canonical URL -> JSON crawl state
+        self.states_key = f'{namespace}:states'
+        # canonical URL -> lease expiry (sorted set)
+        self.leases_key = f'{namespace}:leases'
+        # canonical URL -> lease token
+        self.owners_key = f'{namespace}:owners'
+
+    def _queue_key(self, source):
+        return f'{self.namespace}:queue:{source or "all"}'
+
+    # Queue URLs not seen before; returns how many were new
+    def enqueue(self, urls, source=None):
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for url in urls:
+            state = {'url': url, 'source': source, 'state': DISCOVERED, 'attempts': 0, 'error': None}
+            pipe.hsetnx(self.states_key, canonicalize_url(url), json.dumps(state))
+        new_urls = [url for url, added in zip(urls, pipe.execute()) if added]
+        if new_urls:
+            self.client.rpush(self._queue_key(source), *new_urls)
+        return len(new_urls)
+
+    # Put the URLs of expired leases back at the head of their queues
+    def _reclaim(self, worker):
+        now = time.time()
+        expired = self.client.zrangebyscore(self.leases_key, '-inf', now)
+        if not expired:
+            return 0
+
+        def requeue(pipe):
+            scores = [pipe.zscore(self.leases_key, key) for key in expired]
+            keys = [key for key, score in zip(expired, scores) if score is not None and score < now]
+            states = [json.loads(state) for state in pipe.hmget(self.states_key, keys)] if keys else []
+            pipe.multi()
+            if keys:
+                pipe.zrem(self.leases_key, *keys)
+                pipe.hdel(self.owners_key, *keys)
+            for state in states:
+                pipe.lpush(self._queue_key(state['source']), state['url'])
+            return len(keys)
+
+        reclaimed = self.client.transaction(requeue, self.leases_key, value_from_callable=True)
+        if reclaimed:
+            logging.warning(f"{worker} reclaimed {reclaimed} URLs from expired leases")
+        return reclaimed
+
+    def claim(self, worker, source=None, limit=DEFAULT_BATCH_SIZE):
+        self._reclaim(worker)
+        lease = Lease(uuid.uuid4().hex, worker, source, [], time.time() + self.lease_seconds)
+        queue_key = self._queue_key(source)
+
+        def take(pipe):
+            urls = pipe.lrange(queue_key, 0, limit - 1)
+            keys = [canonicalize_url(url) for url in urls]
+            pipe.multi()
+            if urls:
+                pipe.ltrim(queue_key, len(urls), -1)
+                pipe.zadd(self.leases_key, dict.fromkeys(keys, lease.expires))
+                pipe.hset(self.owners_key, mapping=dict.fromkeys(keys, lease.token))
+            return urls
+
+        lease.urls = self.client.transaction(take, queue_key, value_from_callable=True)
+        lease.open = set(lease.urls)
+        return lease
+
+    def heartbeat(self, lease):
+        keys = [canonicalize_url(url) for url in lease.open]
+        if not keys:
+            return 0
+        expires = time.time() + self.lease_seconds
+
+        def extend(pipe):
+            owners = pipe.hmget(self.owners_key, keys)
+            held = [key for key, owner in zip(keys, owners) if owner == lease.token]
+            pipe.multi()
+            if held:
+                pipe.zadd(self.leases_key, dict.fromkeys(held, expires), xx=True)
+            return len(held)
+
+        held = self.client.transaction(extend, self.owners_key, value_from_callable=True)
+        lease.expires = expires
+        return held
+
+    def complete(self, lease, results):
+        results = list(results)
+        for _, state, _ in results:
+            if state not in STATES:
+                raise ValueError(f"Unknown crawl state: {state}")
+        keys = [canonicalize_url(url) for url, _, _ in results]
+
+        def book(pipe):
+            owners = pipe.hmget(self.owners_key, keys) if keys else []
+            states = pipe.hmget(self.states_key, keys) if keys else []
+            accepted = []
+            updates = {}
+            retries = []
+            for (url, state, error), key, owner, current in zip(results, keys, owners, states):
+                if owner != lease.token or key in updates:
+                    continue
+                record = json.loads(current)
+                # Only a finished attempt counts towards MAX_ATTEMPTS
+                record['attempts'] += state in (EXTRACTED, FAILED)
+                record.update(state=state, error=error, updated=time.time())
+                updates[key] = json.dumps(record)
+                if state != EXTRACTED and record['attempts'] < MAX_ATTEMPTS:
+                    retries.append(record)
+                accepted.append((url, state, error))
+            pipe.multi()
+            if updates:
+                pipe.hset(self.states_key, mapping=updates)
+                pipe.hdel(self.owners_key, *updates)
+                pipe.zrem(self.leases_key, *updates)
+            for record in retries:
+                pipe.rpush(self._queue_key(record['source']), record['url'])
+            return accepted
+
+        accepted = self.client.transaction(book, self.owners_key, value_from_callable=True)
+        _log_rejected(lease, results, accepted)
+        lease.finish(url for url, _, _ in results)
+        return accepted
+
+    def release(self, lease):
+        urls = {canonicalize_url(url): url for url in lease.open}
+        if urls:
+            def give_back(pipe):
+                owners = pipe.hmget(self.owners_key, list(urls))
+                held = [key for key, owner in zip(urls, owners) if owner == lease.token]
+                pipe.multi()
+                if held:
+                    pipe.hdel(self.owners_key, *held)
+                    pipe.zrem(self.leases_key, *held)
+                    pipe.lpush(self._queue_key(lease.source), *[urls[key] for key in held])
+
+            self.client.transaction(give_back, self.owners_key)
+        lease.open.clear()
+
+    def queue_counts(self, source=None):
+        now = time.time()
+        return {
+            'queued': self.client.llen(self._queue_key(source)),
+            'leased': self.client.zcount(self.leases_key, now, '+inf'),
+            'expired': self.client.zcount(self.leases_key, '-inf', now),
+            'known': self.client.hlen(self.states_key),
+        }
+
+    def close(self):
+        self.client.close()
+
+
+def _log_rejected(lease, results, accepted):
+    rejected = len(results) - len(accepted)
+    if rejected:
+        logging.warning(f"Dropped {rejected} results of {lease.worker}: lease {lease.token[:8]} "
+                        f"no longer holds those URLs (expired, or already reported)")
+
+
+# Keeps the leases a worker holds alive from a background thread
+class LeaseKeeper:
+    def __init__(self, queue, interval=None):
+        self.queue = queue
+        self.interval = interval or queue.lease_seconds / HEARTBEATS_PER_LEASE
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+
+    def add(self, lease):
+        with self._lock:
+            self._leases[lease.token] = lease
+
+    def discard(self, lease):
+        with self._lock:
+            self._leases.pop(lease.token, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                for token in [token for token, lease in self._leases.items() if not lease.open]:
+                    del self._leases[token]
+                leases = list(self._leases.values())
+            for lease in leases:
+                try:
+                    held = self.queue.heartbeat(lease)
+                except Exception as e:
+                    logging.error(f"Heartbeat for lease {lease.token[:8]} failed: {str(e)}")
+                    continue
+                if held < len(lease.open):
+                    logging.warning(f"Lease {lease.token[:8]} lost {len(lease.open) - held} URLs to other workers")
+
+    # Stop heartbeating and hand back whatever is still open
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            leases = list(self._leases.values())
+            self._leases.clear()
+        for lease in leases:
+            if lease.open:
+                self.queue.release(lease)
+
+
+# `location` is 'sqlite' (leases in the frontier database) or a redis:// URL
+def open_queue(location='sqlite', frontier_path=DEFAULT_FRONTIER_PATH,
+               lease_seconds=DEFAULT_LEASE_SECONDS, namespace=DEFAULT_NAMESPACE):
+    if location == 'sqlite':
+        return SqliteLeaseQueue(frontier_path, lease_seconds)
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        # Only needed for multi-machine runs
+        import redis
+        return RedisLeaseQueue(redis.Redis.from_url(location, decode_responses=True), namespace, lease_seconds)
+    raise ValueError(f"Unknown queue backend: {location}")
+
+
+# Claim batches for `source` until none are left, passing each batch's URLs
+# to `process_batch`, which returns their (url, state, error) outcomes.
+# URLs it returns no outcome for are booked as FAILED, so they use up an
+# attempt and cannot be claimed again forever. If process_batch raises, the
+# batch is released for other workers straight away.
+def run_worker(queue, source, process_batch, worker=None, batch_size=DEFAULT_BATCH_SIZE):
+    worker = worker or default_worker_id()
+    keeper = LeaseKeeper(queue)
+    totals = {'batches': 0, 'urls': 0, 'accepted': 0}
+    try:
+        while True:
+            lease = queue.claim(worker, source, batch_size)
+            if not lease.urls:
+                break
+            keeper.add(lease)
+            try:
+                outcomes = list(process_batch(lease.urls))
+                reported = {canonicalize_url(url) for url, _, _ in outcomes}
+                missing = [url for url in lease.urls if canonicalize_url(url) not in reported]
+                if missing:
+                    logging.warning(f"No outcome for {len(missing)} URLs of lease {lease.token[:8]}, booking them as failed")
+                    outcomes.extend((url, FAILED, 'no outcome reported') for url in missing)
+                accepted = queue.complete(lease, outcomes)
+            finally:
+                keeper.discard(lease)
+                if lease.open:
+                    queue.release(lease)
+            totals['batches'] += 1
+            totals['urls'] += len(lease)
+            totals['accepted'] += len(accepted)
+    finally:
+        keeper.close()
+    logging.info(f"Worker {worker} finished: {totals}")
+    return totals
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Inspect and fill the shared crawl queue')
+    parser.add_argument('--queue', default='sqlite', help="'sqlite' or a redis:// URL")
+    parser.add_argument('--state', default=DEFAULT_FRONTIER_PATH, help='crawl-state database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    status_parser = subparsers.add_parser('status', help='print queue and lease counts')
+    status_parser.add_argument('--source')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='queue the pending URLs of the local crawl state')
+    enqueue_parser.add_argument('--source', required=True)
+
+    args = parser.parse_args()
+    queue = open_queue(args.queue, args.state)
+    try:
+        if args.command == 'status':
+            print(json.dumps(queue.queue_counts(args.source)))
+        elif args.command == 'enqueue':
+            frontier = Frontier(args.state)
+            try:
+                added = queue.enqueue(frontier.pending(args.source), args.source)
+            finally:
+                frontier.close()
+            logging.info(f"Queued {added} new {args.source} URLs")
+    finally:
+        queue.close()
@@ -0,0 +1,356 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from itertools import combinations
+
+from article_store import SegmentArticleStore
+from frontier import canonicalize_url
+from instrumentation import metrics
+
+# Near-duplicate detection for extracted articles, across sources and runs.
+# Each article's text gets a 64-bit SimHash over word 3-shingles, so copies
+# of the same wire story, or a republished version with a few edits, end up
+# a few bits apart: reworded ledes, a dropped paragraph or an added
+# attribution line typically move it 3 to 8 bits.
+#
+# Fingerprints are stored in SQLite and looked up in memory. The 64 bits
+# are split into three bands of 21-22 bits, and each band keeps a hash
+# table from band value to fingerprints. Two fingerprints within 7 bits of
+# each other differ in at most two bits of at least one band, so a lookup
+# probes each band with its own value and every value up to two bits away
+# (about 700 dict lookups) and compares only the fingerprints found there,
+# a few hundred per million articles. Fingerprints other processes add are
+# read in by rowid before every lookup. Only the closest match goes back
+# to SQLite, for its URL.
+#
+# DedupStore wraps an article store: a near-duplicate of an article from
+# another URL is either saved with `duplicate_of`/`duplicate_distance`
+# fields (`flag`) or not saved at all (`skip`).
+
+DEFAULT_PATH = 'article_fingerprints.db'
+DEFAULT_MODE = 'flag'
+MODES = ('off', 'flag', 'skip')
+
+FINGERPRINT_BITS = 64
+BANDS = 3
+BAND_WIDTHS = tuple(FINGERPRINT_BITS // BANDS + (band < FINGERPRINT_BITS % BANDS) for band in range(BANDS))
+BAND_OFFSETS = tuple(sum(BAND_WIDTHS[:band]) for band in range(BANDS))
+# Bits each band value is probed around; a radius r finds every match
+# up to BANDS * (r + 1) - 1 bits apart
+MAX_PROBE_RADIUS = 3
+MAX_DISTANCE = BANDS * (MAX_PROBE_RADIUS + 1) - 1
+DEFAULT_MAX_DISTANCE = 7
+SHINGLE_WORDS = 3
+# Teasers and stubs are too short to fingerprint reliably
+MIN_WORDS = 50
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+# 64-bit SimHash of `text`, or None when it has fewer than MIN_WORDS words
+def simhash(text):
+    tokens = TOKEN_PATTERN.findall((text or '').lower())
+    if len(tokens) < MIN_WORDS:
+        return None
+    shingles = Counter(' '.join(tokens[i:i + SHINGLE_WORDS]) for i in range(len(tokens) - SHINGLE_WORDS + 1))
+
+    # Weight per bit of the shingles that have it set; a bit of the
+    # fingerprint is set when more than half the total weight has it
+    set_weight = [0] * FINGERPRINT_BITS
+    total = 0
+    for shingle, weight in shingles.items():
+        digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        bits = f'{int.from_bytes(digest, "big"):064b}'
+        for i, bit in enumerate(bits):
+            if bit == '1':
+                set_weight[i] += weight
+        total += weight
+    return int(''.join('1' if 2 * weight > total else '0' for weight in set_weight), 2)
+
+
+def bands(fingerprint):
+    return [(fingerprint >> offset) & ((1 << width) - 1) for offset, width in zip(BAND_OFFSETS, BAND_WIDTHS)]
+
+
+# XOR masks reaching every value within `radius` bits in a band of `width` bits
+def probe_masks(width, radius):
+    masks = [0]
+    for flipped in range(1, radius + 1):
+        for bits in combinations(range(width), flipped):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class DuplicateIndex:
+    def __init__(self, path=DEFAULT_PATH, max_distance=DEFAULT_MAX_DISTANCE):
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_DISTANCE}")
+        self.path = path
+        self.max_distance = max_distance
+        self._masks = [probe_masks(width, max_distance // BANDS) for width in BAND_WIDTHS]
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_table()
+        self._insert_sql = """
+            INSERT OR REPLACE INTO fingerprints (url, fetch_url, source, simhash, duplicate_of, added)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+
+        # Band value -> fingerprint, or a tuple of them when several share it
+        self._tables = [{} for _ in range(BANDS)]
+        self._loaded = 0
+        self._load()
+
+    def _create_table(self):
+        # AUTOINCREMENT so a replaced row always gets a new id the other
+        # processes' incremental loads pick up
+        schema = """
+            CREATE TABLE IF NOT EXISTS {} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                fetch_url TEXT,
+                source TEXT,
+                simhash INTEGER NOT NULL,
+                duplicate_of TEXT,
+                added REAL NOT NULL
+            )
+        """
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(fingerprints)')}
+        if columns and 'id' not in columns:
+            # Databases from before the in-memory index kept indexed band columns
+            fetch_url = 'fetch_url' if 'fetch_url' in columns else 'NULL'
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute(schema.format('fingerprints_new'))
+            self._conn.execute(f"""
+                INSERT INTO fingerprints_new (url, fetch_url, source, simhash, duplicate_of, added)
+                SELECT url, {fetch_url}, source, simhash, duplicate_of, added FROM fingerprints ORDER BY added
+            """)
+            self._conn.execute('DROP TABLE fingerprints')
+            self._conn.execute('ALTER TABLE fingerprints_new RENAME TO fingerprints')
+            self._conn.execute('COMMIT')
+        self._conn.execute(schema.format('fingerprints'))
+        self._conn.execute('CREATE INDEX IF NOT EXISTS fingerprints_simhash ON fingerprints (simhash)')
+
+    # Add fingerprints stored since the last call, by this or any other process
+    def _load(self):
+        rows = self._conn.execute(
+            'SELECT id, simhash FROM fingerprints WHERE id > ? ORDER BY id', (self._loaded,)
+        ).fetchall()
+        for row_id, stored in rows:
+            self._add(_unsigned(stored))
+        if rows:
+            self._loaded = rows[-1][0]
+
+    def _add(self, fingerprint):
+        for table, value in zip(self._tables, bands(fingerprint)):
+            bucket = table.get(value)
+            if bucket is None:
+                table[value] = fingerprint
+            elif type(bucket) is int:
+                if bucket != fingerprint:
+                    table[value] = (bucket, fingerprint)
+            elif fingerprint not in bucket:
+                table[value] = bucket + (fingerprint,)
+
+    # Stored fingerprints within max_distance bits, closest first, as
+    # (fingerprint, distance)
+    def _nearby(self, fingerprint):
+        found = {}
+        for table, value, masks in zip(self._tables, bands(fingerprint), self._masks):
+            get = table.get
+            for mask in masks:
+                bucket = get(value ^ mask)
+                if bucket is None:
+                    continue
+                for stored in (bucket,) if type(bucket) is int else bucket:
+                    distance = (fingerprint ^ stored).bit_count()
+                    if distance <= self.max_distance:
+                        found[stored] = distance
+        return sorted(found.items(), key=lambda item: item[1])
+
+    # Closest stored article within max_distance bits, as (url, distance),
+    # with the URL the article was saved under. A match that is itself a
+    # duplicate resolves to the article it copies. `exclude_url` (a canonical
+    # URL) and its own copies are left out, so re-saving an article never
+    # marks it as a duplicate of itself.
+    def find(self, fingerprint, exclude_url=None):
+        with self._lock:
+            self._load()
+            # Fingerprints whose rows were since replaced or deleted match no row
+            for stored, distance in self._nearby(fingerprint):
+                for key, fetch_url, duplicate_of in self._conn.execute(
+                        'SELECT url, fetch_url, duplicate_of FROM fingerprints WHERE simhash = ?', (_signed(stored),)):
+                    if exclude_url is not None and (
+                            key == exclude_url or (duplicate_of and canonicalize_url(duplicate_of) == exclude_url)):
+                        continue
+                    return duplicate_of or fetch_url or key, distance
+        return None
+
+    # Fingerprint `text`, look it up and record it in one transaction.
+    # Returns (original url, distance) for a near-duplicate, else None.
+    def check(self, url, source, text):
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        key = canonicalize_url(url)
+        with self._lock:
+            # Taken up front so two processes cannot both file the same story as new
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                match = self.find(fingerprint, exclude_url=key)
+                self._conn.execute(self._insert_sql, (
+                    key, url, source, _signed(fingerprint), match[0] if match else None, time.time()
+                ))
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        return match
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT source, COUNT(*), COUNT(duplicate_of) FROM fingerprints GROUP BY source
+            """).fetchall()
+        return {source: {'articles': total, 'duplicates': duplicates} for source, total, duplicates in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Article store wrapper that checks every record before it is saved
+class DedupStore:
+    def __init__(self, store, index, source, mode=DEFAULT_MODE):
+        self.store = store
+        self.index = index
+        self.source = source
+        self.mode = mode
+
+    # Returns where the record was saved, or None when it was skipped
+    def save(self, url, record, filename=None):
+        with metrics.timer('dedup'):
+            match = self.index.check(url, self.source, record.get('content'))
+        if match is None:
+            return self.store.save(url, record, filename=filename)
+
+        original, distance = match
+        metrics.inc('articles/duplicates')
+        if self.mode == 'skip':
+            logging.info(f"Skipping {url}: near-duplicate of {original} ({distance} bits apart)")
+            return None
+        logging.info(f"Flagging {url} as a near-duplicate of {original} ({distance} bits apart)")
+        record = dict(record, duplicate_of=original, duplicate_distance=distance)
+        return self.store.save(url, record, filename=filename)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+_index = None
+_mode = 'off'
+
+
+def configure_dedup(path=DEFAULT_PATH, mode=DEFAULT_MODE, max_distance=DEFAULT_MAX_DISTANCE):
+    global _index, _mode
+    close_dedup()
+    if mode != 'off':
+        _index = DuplicateIndex(path, max_distance=max_distance)
+    _mode = mode
+    return _index
+
+
+# Wrap `store` with the configured duplicate check, if any
+def dedup_store(store, source):
+    if _index is None:
+        return store
+    return DedupStore(store, _index, source, _mode)
+
+
+def close_dedup():
+    global _index, _mode
+    if _index is not None:
+        _index.close()
+        _index = None
+    _mode = 'off'
+
+
+def _stored_records(storage, root):
+    if storage == 'segments':
+        store = SegmentArticleStore(root)
+        try:
+            yield from store.iter_records()
+        finally:
+            store.close()
+        return
+    for path in sorted(glob.glob(os.path.join(root, '*.json'))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield json.load(f)
+        except (IOError, ValueError) as e:
+            logging.error(f"Skipping unreadable {path}: {str(e)}")
+
+
+# Fingerprint articles saved before deduplication was switched on
+def seed(index, source, storage, root):
+    added = 0
+    duplicates = 0
+    for record in _stored_records(storage, root):
+        if not record.get('url'):
+            continue
+        match = index.check(record['url'], source, record.get('content'))
+        added += 1
+        duplicates += match is not None
+    logging.info(f"Fingerprinted {added} {source} articles from {root} ({duplicates} near-duplicates)")
+    return added, duplicates
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Near-duplicate article index')
+    parser.add_argument('--index', default=DEFAULT_PATH, help='fingerprint database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='fingerprint articles already in a store')
+    seed_parser.add_argument('source', choices=['coindesk', 'cointelegraph'])
+    seed_parser.add_argument('root', help='article store directory')
+    seed_parser.add_argument('--storage', choices=['files', 'segments'], default='files')
+
+    subparsers.add_parser('stats', help='fingerprinted articles and duplicates per source')
+
+    args = parser.parse_args()
+    index = DuplicateIndex(args.index)
+    try:
+        if args.command == 'seed':
+            seed(index, args.source, args.storage, args.root)
+        else:
+            print(json.dumps(index.counts(), indent=2))
+    finally:
+        index.close()
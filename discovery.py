@@ -0,0 +1,222 @@
+import argparse
+import gzip
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from lxml import etree
+
+import http_client
+from frontier import Frontier, DEFAULT_PATH as DEFAULT_FRONTIER_PATH
+
+# Feed-based article discovery.
+# News sitemaps and RSS/Atom feeds are streamed and parsed element by element
+# with lxml.iterparse, so a large sitemap never sits in memory as a whole.
+# Entries (and child sitemaps of an index) whose lastmod / pubDate is older
+# than the last successful run are skipped; the rest are matched against the
+# source's article URL pattern and recorded in the crawl-state store.
+
+# Articles are the only pages the extractors understand
+ARTICLE_URL_PATTERNS = {
+    'coindesk': re.compile(r'/(?:markets|business|tech|opinion|policy)/\d{4}/\d{2}/\d{2}/'),
+    'cointelegraph': re.compile(r'/news/[^/?#]+'),
+}
+
+FEEDS = {
+    'coindesk': {
+        'sitemaps': ['https://www.coindesk.com/arc/outboundfeeds/news-sitemap-index/?outputType=xml'],
+        'rss': ['https://www.coindesk.com/arc/outboundfeeds/rss/'],
+    },
+    'cointelegraph': {
+        'sitemaps': ['https://cointelegraph.com/sitemap.xml'],
+        'rss': ['https://cointelegraph.com/rss'],
+    },
+}
+
+# Feeds are regenerated on a schedule; re-read a little before the last run
+OVERLAP = timedelta(hours=1)
+# How far back the first run (no checkpoint yet) looks, short of --full
+INITIAL_LOOKBACK = timedelta(days=3)
+MAX_SITEMAP_DEPTH = 3
+FEED_TIMEOUT = 30
+
+CHECKPOINT_PREFIX = 'discovery/'
+
+
+def is_article_url(source, url):
+    return bool(ARTICLE_URL_PATTERNS[source].search(url))
+
+
+# W3C datetime (sitemaps, Atom) or RFC 822 (RSS) as an aware UTC datetime
+def parse_feed_date(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _localname(element):
+    return etree.QName(element).localname
+
+
+# Yield (kind, url, date) for each entry of a sitemap, sitemap index, RSS or
+# Atom document; kind is 'sitemap' for children of an index, else 'page'
+def iter_feed_entries(stream):
+    for _, element in etree.iterparse(stream, events=('end',), tag=('{*}url', '{*}sitemap', '{*}item', '{*}entry'),
+                                      recover=True, resolve_entities=False):
+        kind = 'sitemap' if _localname(element) == 'sitemap' else 'page'
+        namespace = etree.QName(element).namespace
+        url = None
+        # The entry's own <loc>/<link> only: extensions such as <image:loc>
+        # sit deeper or in another namespace and must not replace it
+        for child in element:
+            if url is not None or not isinstance(child.tag, str) or etree.QName(child).namespace != namespace:
+                continue
+            name = _localname(child)
+            if name == 'loc' and child.text:
+                url = child.text.strip() or None
+            elif name == 'link':
+                # RSS puts the URL in the text, Atom in href
+                url = (child.get('href') or child.text or '').strip() or None
+        # Dates may be nested, e.g. <news:news><news:publication_date>
+        dates = []
+        for child in element.iter():
+            name = _localname(child) if isinstance(child.tag, str) else None
+            if name in ('lastmod', 'publication_date', 'pubDate', 'updated', 'published'):
+                dates.append(parse_feed_date(child.text))
+        dates = [d for d in dates if d is not None]
+
+        if url:
+            yield kind, url, max(dates) if dates else None
+
+        # Drop parsed entries so memory stays flat on large sitemaps
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+class FeedDiscovery:
+    def __init__(self, source, frontier, since=None):
+        self.source = source
+        self.frontier = frontier
+        self.since = since
+        self.cutoff = since - OVERLAP if since else None
+        self.stats = {'feeds': 0, 'failed_feeds': 0, 'entries': 0, 'too_old': 0, 'not_articles': 0, 'new': 0}
+
+    def _is_recent(self, date):
+        # Undated entries are kept; the frontier drops those already seen
+        return self.cutoff is None or date is None or date >= self.cutoff
+
+    # Whether to keep a page entry or follow a child sitemap
+    def _wanted(self, kind, url, date):
+        return self._is_recent(date)
+
+    def read_feed(self, url, depth=0):
+        self.stats['feeds'] += 1
+        urls = []
+        try:
+            response = http_client.fetch_stream(url, timeout=FEED_TIMEOUT)
+        except Exception as e:
+            logging.error(f"Could not fetch feed {url}: {str(e)}")
+            self.stats['failed_feeds'] += 1
+            return urls, False
+
+        ok = True
+        children = []
+        try:
+            stream = response.raw
+            if urlsplit(url).path.endswith('.gz'):
+                # Compressed sitemap files, as opposed to a compressed transfer
+                stream = gzip.GzipFile(fileobj=stream)
+            for kind, entry_url, date in iter_feed_entries(stream):
+                if not self._wanted(kind, entry_url, date):
+                    self.stats['too_old'] += 1
+                    continue
+                if kind == 'sitemap':
+                    children.append(entry_url)
+                    continue
+                self.stats['entries'] += 1
+                if not is_article_url(self.source, entry_url):
+                    self.stats['not_articles'] += 1
+                    continue
+                urls.append(entry_url)
+        except (etree.XMLSyntaxError, OSError) as e:
+            logging.error(f"Could not parse feed {url}: {str(e)}")
+            self.stats['failed_feeds'] += 1
+            ok = False
+        finally:
+            response.close()
+
+        for child in children:
+            if depth >= MAX_SITEMAP_DEPTH:
+                logging.warning(f"Not following {child}: sitemap nesting too deep")
+                continue
+            child_urls, child_ok = self.read_feed(child, depth + 1)
+            urls.extend(child_urls)
+            ok = ok and child_ok
+        return urls, ok
+
+    # Read every configured feed; returns (new article URLs, all feeds read)
+    def run(self):
+        feeds = FEEDS[self.source]
+        urls = []
+        ok = True
+        for feed_url in feeds.get('sitemaps', []) + feeds.get('rss', []):
+            feed_urls, feed_ok = self.read_feed(feed_url)
+            urls.extend(feed_urls)
+            ok = ok and feed_ok
+
+        with self.frontier.batch():
+            new_urls = [url for url in dict.fromkeys(urls) if self.frontier.state(url) is None]
+            self.frontier.discover_many(new_urls, self.source)
+        self.stats['new'] = len(new_urls)
+        return new_urls, ok
+
+
+def last_run(frontier, source):
+    value = frontier.checkpoint(CHECKPOINT_PREFIX + source)
+    return datetime.fromisoformat(value) if value else None
+
+
+# Discover new articles for `source` and record them as pending in the
+# frontier. The checkpoint only moves forward when every feed was read, so a
+# failed run is retried from the previous checkpoint next time.
+def discover(source, frontier, full=False):
+    started = datetime.now(timezone.utc)
+    since = None if full else (last_run(frontier, source) or started - INITIAL_LOOKBACK)
+    discovery = FeedDiscovery(source, frontier, since)
+    new_urls, ok = discovery.run()
+
+    if ok:
+        frontier.set_checkpoint(CHECKPOINT_PREFIX + source, started.isoformat())
+    logging.info(f"Discovered {len(new_urls)} new {source} articles since "
+                 f"{since.isoformat() if since else 'the beginning'}: {discovery.stats}")
+    return new_urls, ok
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Discover new articles from sitemaps and RSS feeds')
+    parser.add_argument('sources', nargs='*', default=sorted(FEEDS), choices=sorted(FEEDS))
+    parser.add_argument('--state', default=DEFAULT_FRONTIER_PATH, help='crawl-state database')
+    parser.add_argument('--full', action='store_true', help='ignore the last run and read every entry')
+    args = parser.parse_args()
+
+    frontier = Frontier(args.state)
+    try:
+        for source in args.sources:
+            discover(source, frontier, full=args.full)
+    finally:
+        frontier.close()
@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+# Parse-once document model.
+# A page is parsed a single time with lxml; trafilatura, the site specific
+# selector lookups and the paragraph walker all read from the same tree.
+
+
+@lru_cache(maxsize=256)
+def _compile(selector):
+    return CSSSelector(selector)
+
+
+class Document:
+    def __init__(self, html, url=None):
+        self.url = url
+        if isinstance(html, str):
+            # lxml refuses unicode input that still carries an XML encoding
+            # declaration, so hand it bytes with an explicit encoding instead
+            html = html.encode('utf-8', errors='replace')
+        parser = lxml.html.HTMLParser(encoding='utf-8')
+        self.tree = lxml.html.document_fromstring(html, parser=parser)
+        self.size = len(html)
+
+    def select(self, selector, root=None):
+        return _compile(selector)(self.tree if root is None else root)
+
+    def select_one(self, selector, root=None):
+        matches = self.select(selector, root)
+        return matches[0] if matches else None
+
+    # Stripped text of the first match, or None
+    def select_text(self, selector, root=None):
+        element = self.select_one(selector, root)
+        if element is None:
+            return None
+        return self.text(element)
+
+    # First selector in the list that matches, as (selector, element)
+    def first_match(self, selectors, root=None):
+        for selector in selectors:
+            element = self.select_one(selector, root)
+            if element is not None:
+                return selector, element
+        return None, None
+
+    @staticmethod
+    def text(element):
+        return element.text_content().strip()
+
+    @staticmethod
+    def classes(element):
+        return element.get('class', '').split()
+
+    # Walk p/h2/h3 (by default) descendants of container in document order
+    def paragraphs(self, container, tags=('p', 'h2', 'h3'), skip_classes=()):
+        texts = []
+        for element in container.xpath(' | '.join(f'.//{tag}' for tag in tags)):
+            if skip_classes and any(c in skip_classes for c in self.classes(element)):
+                continue
+            text = self.text(element)
+            if text:
+                texts.append(text)
+        return texts
+
+    def links(self):
+        return [a.get('href') for a in self.tree.iter('a') if a.get('href')]
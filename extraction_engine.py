@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from instrumentation import metrics
+from log_setup import worker_log_config, init_worker_logging
+
+# Bounded-concurrency runner for the article extraction stage.
+# Each URL is handed to `extract_fn` on a worker thread; at most `max_workers`
+# extractions are in flight at once and each one gets its own timeout.
+# Results come back in the same order as the input URLs.
+#
+# run_pipeline splits the work in two: `fetch_fn` downloads on the thread
+# pool (I/O stage) and `parse_fn` runs on a process pool (CPU stage), so
+# parsing is not serialized on the GIL. Fetched pages are handed over in
+# chunks, and at most two chunks per process wait in the CPU stage; beyond
+# that fetching pauses until parsing catches up. Parsing one page gets the
+# same timeout as fetching it.
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 60
+DEFAULT_PROCESSES = os.cpu_count() or 1
+DEFAULT_CHUNKSIZE = 4
+
+
+async def _extract_all(urls, extract_fn, max_workers, timeout, on_result):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_workers)
+    # Timed-out calls keep their thread until the underlying request gives up,
+    # so leave some headroom above the concurrency limit.
+    executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix='extract')
+
+    async def run(index, url):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(executor, extract_fn, url),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                logging.error(f"Timed out after {timeout}s extracting {url}")
+                result = None
+            except Exception as e:
+                logging.error(f"Error extracting {url}: {str(e)}")
+                result = None
+
+            logging.info(f"Finished {url} in {time.monotonic() - started:.2f}s")
+
+            # Callbacks run on the event loop thread, so bookkeeping done
+            # there never races with other results.
+            if on_result:
+                try:
+                    on_result(index, url, result)
+                except Exception as e:
+                    logging.error(f"Error handling result for {url}: {str(e)}")
+            return result
+
+    try:
+        return await asyncio.gather(*(run(i, url) for i, url in enumerate(urls)))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_extractions(urls, extract_fn, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, on_result=None):
+    urls = list(urls)
+    if not urls:
+        return []
+
+    max_workers = max(1, int(max_workers))
+    logging.info(f"Extracting {len(urls)} URLs with {max_workers} workers (timeout {timeout}s)")
+    started = time.monotonic()
+    results = asyncio.run(_extract_all(urls, extract_fn, max_workers, timeout, on_result))
+
+    succeeded = sum(1 for r in results if r)
+    logging.info(f"Extracted {succeeded}/{len(urls)} URLs in {time.monotonic() - started:.2f}s")
+    return results
+
+
+def create_process_pool(processes=DEFAULT_PROCESSES):
+    # Fetch threads may hold locks (logging, connection pools) at the moment
+    # a worker starts, so workers are spawned rather than forked. Their log
+    # records go to the parent's log listener.
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker_logging, initargs=(worker_log_config(),))
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+def _parse_timed_out(signum, frame):
+    raise ParseTimeout()
+
+
+# Runs in a worker process: parse one chunk of fetched pages. The metrics
+# recorded meanwhile go back with the results. A page that takes longer than
+# `timeout` is interrupted with SIGALRM (where there is one, so not on
+# Windows) and comes back as None, rather than holding the worker forever.
+def _parse_chunk(parse_fn, jobs, timeout=None):
+    timed = bool(timeout) and hasattr(signal, 'setitimer')
+    if timed:
+        signal.signal(signal.SIGALRM, _parse_timed_out)
+    results = []
+    for url, payload in jobs:
+        result = None
+        try:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                result = parse_fn(url, payload)
+            finally:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except ParseTimeout:
+            logging.error(f"Timed out after {timeout}s parsing {url}")
+        except Exception as e:
+            logging.error(f"Error parsing {url}: {str(e)}")
+        results.append(result)
+    return results, metrics.drain()
+
+
+async def _fetch_and_parse(urls, fetch_fn, parse_fn, max_workers, timeout, processes, chunksize, on_result):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_workers)
+    cpu_slots = asyncio.Semaphore(processes * 2)
+    io_executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix='fetch')
+    cpu_executor = create_process_pool(processes)
+
+    results = [None] * len(urls)
+    chunk = []
+    parsing = []
+    unfetched = len(urls)
+
+    def report(index, url, result):
+        results[index] = result
+        if on_result:
+            try:
+                on_result(index, url, result)
+            except Exception as e:
+                logging.error(f"Error handling result for {url}: {str(e)}")
+
+    async def parse(jobs):
+        try:
+            parsed, worker_metrics = await loop.run_in_executor(
+                cpu_executor, _parse_chunk, parse_fn, [(url, payload) for _, url, payload in jobs], timeout
+            )
+            metrics.merge(worker_metrics)
+        except Exception as e:
+            logging.error(f"Parser process failed on {len(jobs)} pages: {str(e)}")
+            parsed = [None] * len(jobs)
+        finally:
+            cpu_slots.release()
+        for (index, url, _), result in zip(jobs, parsed):
+            report(index, url, result)
+
+    async def hand_over():
+        # Waits here while the CPU stage is full, which holds back fetching
+        await cpu_slots.acquire()
+        if not chunk:
+            # Another fetch handed this chunk over while we waited
+            cpu_slots.release()
+            return
+        jobs = chunk[:chunksize]
+        del chunk[:chunksize]
+        parsing.append(asyncio.ensure_future(parse(jobs)))
+
+    async def fetch(index, url):
+        nonlocal unfetched
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                payload = await asyncio.wait_for(
+                    loop.run_in_executor(io_executor, fetch_fn, url),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                logging.error(f"Timed out after {timeout}s fetching {url}")
+                payload = None
+            except Exception as e:
+                logging.error(f"Error fetching {url}: {str(e)}")
+                payload = None
+
+            logging.info(f"Fetched {url} in {time.monotonic() - started:.2f}s")
+            unfetched -= 1
+            if payload is None:
+                report(index, url, None)
+            else:
+                chunk.append((index, url, payload))
+
+            # Full chunks go straight away; the remainder once fetching is done
+            while len(chunk) >= chunksize or (chunk and unfetched == 0):
+                await hand_over()
+
+    try:
+        await asyncio.gather(*(fetch(i, url) for i, url in enumerate(urls)))
+        await asyncio.gather(*parsing)
+        return results
+    finally:
+        io_executor.shutdown(wait=False, cancel_futures=True)
+        cpu_executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Two-stage variant of run_extractions: `fetch_fn(url)` returns a picklable
+# payload (or None) and `parse_fn(url, payload)` turns it into the result in a
+# worker process. Both must be importable module-level functions.
+def run_pipeline(urls, fetch_fn, parse_fn, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 processes=DEFAULT_PROCESSES, chunksize=DEFAULT_CHUNKSIZE, on_result=None):
+    urls = list(urls)
+    if not urls:
+        return []
+
+    max_workers = max(1, int(max_workers))
+    processes = max(1, int(processes))
+    chunksize = max(1, int(chunksize))
+    logging.info(f"Extracting {len(urls)} URLs with {max_workers} fetch workers and "
+                 f"{processes} parser processes (chunks of {chunksize}, timeout {timeout}s per fetch and parse)")
+    started = time.monotonic()
+    results = asyncio.run(_fetch_and_parse(
+        urls, fetch_fn, parse_fn, max_workers, timeout, processes, chunksize, on_result
+    ))
+
+    succeeded = sum(1 for r in results if r)
+    logging.info(f"Extracted {succeeded}/{len(urls)} URLs in {time.monotonic() - started:.2f}s")
+    return results
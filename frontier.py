@@ -0,0 +1,280 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Persistent URL frontier and crawl-state store shared by both spiders and
+# the extraction stages.
+# URLs are canonicalized before they are stored so the same article found
+# through different links, sources or runs maps to a single row. Each row
+# moves through discovered -> fetched -> extracted, or to failed, and every
+# update is committed to SQLite so an interrupted run resumes from the
+# pending rows.
+
+DEFAULT_PATH = 'crawl_state.db'
+MAX_ATTEMPTS = 3
+
+DISCOVERED = 'discovered'
+FETCHED = 'fetched'
+EXTRACTED = 'extracted'
+FAILED = 'failed'
+STATES = (DISCOVERED, FETCHED, EXTRACTED, FAILED)
+
+# State names used before the store tracked the full lifecycle
+LEGACY_STATES = {'new': DISCOVERED, 'done': EXTRACTED}
+
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'ref_src',
+    'igshid', '_ga', '_gl', 'yclid', 'twclid', 'cmpid', 'src',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{host}:{parts.port}'
+
+    path = re.sub(r'/{2,}', '/', parts.path or '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+
+    # Fragments never change the document that is served
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+class Frontier:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._scheduled = set()
+        self._in_batch = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                fetch_url TEXT NOT NULL,
+                source TEXT,
+                state TEXT NOT NULL DEFAULT 'discovered',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                last_fetched REAL,
+                updated REAL,
+                error TEXT
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(urls)')}
+        if 'updated' not in columns:
+            self._conn.execute('ALTER TABLE urls ADD COLUMN updated REAL')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS urls_source_state ON urls (source, state, first_seen)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS urls_state ON urls (state)')
+        # Named progress markers (last discovery run, finished partitions, ...)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY,
+                value TEXT,
+                updated REAL NOT NULL
+            )
+        """)
+        for old, new in LEGACY_STATES.items():
+            self._conn.execute('UPDATE urls SET state = ? WHERE state = ?', (new, old))
+
+    def _row(self, key):
+        return self._conn.execute(
+            'SELECT state, attempts FROM urls WHERE url = ?', (key,)
+        ).fetchone()
+
+    @staticmethod
+    def _is_finished(state, attempts):
+        return state == EXTRACTED or (state == FAILED and attempts >= MAX_ATTEMPTS)
+
+    # Group many updates into one transaction. `immediate` takes the write
+    # lock up front, for read-then-write transactions other processes race on.
+    @contextmanager
+    def batch(self, immediate=False):
+        with self._lock:
+            if self._in_batch:
+                yield self
+                return
+            self._in_batch = True
+            self._conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield self
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+            finally:
+                self._in_batch = False
+
+    def _discover(self, url, source, now):
+        key = canonicalize_url(url)
+        row = self._row(key)
+        if row is None:
+            self._conn.execute(
+                'INSERT INTO urls (url, fetch_url, source, first_seen, last_seen, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, url, source, now, now, now)
+            )
+        else:
+            self._conn.execute('UPDATE urls SET last_seen = ? WHERE url = ?', (now, key))
+        return key, row
+
+    # Record a discovered URL. Returns True when it should be fetched in this
+    # run: not processed before, not failed too often, not already scheduled.
+    def schedule(self, url, source=None):
+        with self._lock:
+            key, row = self._discover(url, source, time.time())
+            if key in self._scheduled:
+                return False
+            if row is not None and self._is_finished(*row):
+                return False
+            self._scheduled.add(key)
+            return True
+
+    # Record discovered URLs without scheduling them; returns how many were new
+    def discover_many(self, urls, source=None):
+        now = time.time()
+        added = 0
+        with self.batch():
+            for url in urls:
+                _, row = self._discover(url, source, now)
+                added += row is None
+        return added
+
+    def should_fetch(self, url):
+        with self._lock:
+            row = self._row(canonicalize_url(url))
+        return row is None or not self._is_finished(*row)
+
+    def _set_state(self, url, state, error, now):
+        key = canonicalize_url(url)
+        # Only a finished attempt counts towards MAX_ATTEMPTS
+        attempt = 1 if state in (EXTRACTED, FAILED) else 0
+        fetched = now if state != DISCOVERED else None
+        self._conn.execute("""
+            INSERT INTO urls (url, fetch_url, state, attempts, first_seen, last_seen, last_fetched, updated, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                state = excluded.state,
+                attempts = attempts + excluded.attempts,
+                last_fetched = COALESCE(excluded.last_fetched, last_fetched),
+                updated = excluded.updated,
+                error = excluded.error
+        """, (key, url, state, attempt, now, now, fetched, now, error))
+
+    def set_state(self, url, state, error=None):
+        if state not in STATES:
+            raise ValueError(f"Unknown crawl state: {state}")
+        with self._lock:
+            self._set_state(url, state, error, time.time())
+
+    # Apply (url, state, error) updates in a single transaction
+    def update_many(self, updates):
+        now = time.time()
+        with self.batch():
+            for url, state, error in updates:
+                if state not in STATES:
+                    raise ValueError(f"Unknown crawl state: {state}")
+                self._set_state(url, state, error, now)
+
+    def mark_fetched(self, url):
+        self.set_state(url, FETCHED)
+
+    def mark_done(self, url):
+        self.set_state(url, EXTRACTED)
+
+    def mark_failed(self, url, error=None):
+        self.set_state(url, FAILED, error)
+
+    # URLs still to be processed for a source, oldest discoveries first.
+    # Rows left in `fetched` by a crashed run are picked up again here.
+    def pending(self, source=None, limit=None):
+        query = """
+            SELECT fetch_url FROM urls
+            WHERE (state IN (?, ?) OR (state = ? AND attempts < ?))
+        """
+        params = [DISCOVERED, FETCHED, FAILED, MAX_ATTEMPTS]
+        if source is not None:
+            query += ' AND source = ?'
+            params.append(source)
+        query += ' ORDER BY first_seen'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params)]
+
+    def state(self, url):
+        with self._lock:
+            row = self._row(canonicalize_url(url))
+        return row[0] if row else None
+
+    def counts(self, source=None):
+        query = 'SELECT state, COUNT(*) FROM urls'
+        params = []
+        if source is not None:
+            query += ' WHERE source = ?'
+            params.append(source)
+        with self._lock:
+            rows = self._conn.execute(query + ' GROUP BY state', params).fetchall()
+        return dict(rows)
+
+    def checkpoint(self, name, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM checkpoints WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_checkpoint(self, name, value):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO checkpoints (name, value, updated) VALUES (?, ?, ?)',
+                (name, value, time.time())
+            )
+
+    # Checkpoint names starting with `prefix`, mapped to their values
+    def checkpoints(self, prefix=''):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT name, value FROM checkpoints WHERE substr(name, 1, ?) = ?',
+                (len(prefix), prefix)
+            ).fetchall()
+        return dict(rows)
+
+    # Load a legacy articles_{date}.json file ({'url', 'processed'} lines)
+    def import_articles_file(self, path, source=None):
+        with open(path, 'r') as f:
+            articles = [json.loads(line) for line in f if line.strip()]
+        now = time.time()
+        with self.batch():
+            for article in articles:
+                self._discover(article['url'], source, now)
+                if article.get('processed'):
+                    self._set_state(article['url'], EXTRACTED, None, now)
+        return len(articles)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        logging.debug(f"Closed frontier {self.path}")
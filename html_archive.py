@@ -0,0 +1,241 @@
+import argparse
+import glob
+import gzip
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Raw HTML archive for offline re-extraction.
+# Every fetched or rendered page is appended as a WARC/1.0 `resource` record,
+# each record compressed as its own gzip member (the usual .warc.gz layout),
+# to size-rolled files under the archive directory. The `reextract` command
+# replays an archive through the current extractors on a process pool, so a
+# selector fix only costs local CPU time instead of a re-crawl.
+
+DEFAULT_ARCHIVE_DIR = 'raw_html'
+DEFAULT_MAX_FILE_BYTES = 256 * 1024 * 1024
+DEFAULT_CHUNKSIZE = 8
+
+# Per-source re-extraction hooks: `reextract_record(url, html, fetched_at)`
+# returns the record to store (or None) for a page fetched at the given UTC
+# datetime, `open_article_store(storage, root)` opens the output store
+EXTRACTORS = {
+    'coindesk': 'scrape_coindesk',
+    'cointelegraph': 'scrape_cointelegraph',
+}
+
+
+def _warc_date(timestamp=None):
+    moment = datetime.fromtimestamp(timestamp or time.time(), tz=timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ArchiveWriter:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, prefix='pages', max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+        self.root = root
+        self.prefix = prefix
+        self.max_file_bytes = max_file_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._sequence = 0
+        self._started = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    def _open_next(self):
+        self._close_file()
+        self._sequence += 1
+        # pid keeps files apart when several processes archive at once
+        name = f'{self.prefix}-{self._started}-{os.getpid()}-{self._sequence:05d}.warc.gz'
+        self.path = os.path.join(self.root, name)
+        self._file = open(self.path, 'ab')
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, url, html, source, mode='http', status=None):
+        body = html.encode('utf-8') if isinstance(html, str) else html
+        headers = [
+            ('WARC-Type', 'resource'),
+            ('WARC-Record-ID', f'<urn:uuid:{uuid.uuid4()}>'),
+            ('WARC-Date', _warc_date()),
+            ('WARC-Target-URI', url),
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('X-Crawl-Source', source),
+            # `http` for plain responses, `rendered` for browser page sources
+            ('X-Fetch-Mode', mode),
+        ]
+        if status is not None:
+            headers.append(('X-Http-Status', str(status)))
+        headers.append(('Content-Length', str(len(body))))
+
+        head = 'WARC/1.0\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in headers) + '\r\n'
+        member = gzip.compress(head.encode('utf-8') + body + b'\r\n\r\n')
+
+        with self._lock:
+            if self._file is None or self._file.tell() + len(member) > self.max_file_bytes:
+                self._open_next()
+            self._file.write(member)
+            self._file.flush()
+        return self.path
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+_writer = None
+
+
+# Start archiving pages fetched by this process; root=None turns it off
+def configure_archive(root=DEFAULT_ARCHIVE_DIR, prefix='pages', max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+    global _writer
+    close_archive()
+    if root:
+        _writer = ArchiveWriter(root, prefix, max_file_bytes)
+    return _writer
+
+
+def archive_page(url, html, source, mode='http', status=None):
+    if _writer is None or not html:
+        return None
+    try:
+        return _writer.write(url, html, source, mode, status)
+    except IOError as e:
+        logging.error(f"Could not archive {url}: {str(e)}")
+        return None
+
+
+def archive_enabled():
+    return _writer is not None
+
+
+def close_archive():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def archive_files(root):
+    if os.path.isfile(root):
+        return [root]
+    return sorted(glob.glob(os.path.join(root, '*.warc.gz')))
+
+
+# Yield (headers, html) for every record in the given archive files
+def iter_records(paths, source=None):
+    for path in paths:
+        try:
+            with gzip.open(path, 'rb') as f:
+                while True:
+                    version = f.readline()
+                    if not version:
+                        break
+                    if not version.strip():
+                        continue
+                    headers = {}
+                    for line in iter(f.readline, b'\r\n'):
+                        if not line:
+                            break
+                        name, _, value = line.decode('utf-8').partition(':')
+                        headers[name.strip()] = value.strip()
+                    body = f.read(int(headers.get('Content-Length', 0)))
+                    f.read(4)
+                    if source and headers.get('X-Crawl-Source') != source:
+                        continue
+                    yield headers, body.decode('utf-8', errors='replace')
+        except (EOFError, gzip.BadGzipFile) as e:
+            # A crash can leave a truncated last member; keep what was complete
+            logging.warning(f"Stopped reading {path} early: {str(e)}")
+
+
+# WARC-Date as a naive UTC datetime, or None when missing or malformed
+def parse_warc_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    except (TypeError, ValueError):
+        return None
+
+
+def _reextract(job):
+    source, url, html, fetched_at = job
+    try:
+        extractor = importlib.import_module(EXTRACTORS[source])
+        return url, extractor.reextract_record(url, html, fetched_at), None
+    except Exception as e:
+        return url, None, str(e)
+
+
+def _archived_jobs(paths, source):
+    for headers, html in iter_records(paths, source):
+        yield (
+            headers.get('X-Crawl-Source'),
+            headers['WARC-Target-URI'],
+            html,
+            parse_warc_date(headers.get('WARC-Date')),
+        )
+
+
+# Run every archived page of `source` through its current extractor.
+# Results come back in archive order, so the newest capture of a URL wins.
+def reextract(root, source, storage='files', output_dir=None, workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    paths = archive_files(root)
+    store = importlib.import_module(EXTRACTORS[source]).open_article_store(storage, output_dir)
+    workers = workers or os.cpu_count()
+    extracted = 0
+    failed = 0
+    started = time.monotonic()
+
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for url, record, error in pool.imap(_reextract, _archived_jobs(paths, source), chunksize):
+                if record:
+                    store.save(url, record)
+                    extracted += 1
+                else:
+                    logging.error(f"Re-extraction failed for {url}: {error or 'no content extracted'}")
+                    failed += 1
+    finally:
+        store.close()
+
+    elapsed = time.monotonic() - started
+    logging.info(f"Re-extracted {extracted} {source} articles from {len(paths)} archive files "
+                 f"in {elapsed:.1f}s with {workers} processes ({failed} failed)")
+    return extracted, failed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Inspect and replay raw HTML archives')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reextract_parser = subparsers.add_parser('reextract', help='rebuild extracted articles from the archive')
+    reextract_parser.add_argument('archive', help='archive directory or a single .warc.gz file')
+    reextract_parser.add_argument('--source', choices=sorted(EXTRACTORS), required=True)
+    reextract_parser.add_argument('--storage', choices=['files', 'segments'], default='files')
+    reextract_parser.add_argument('--output-dir', help='defaults to the scraper\'s own output directory')
+    reextract_parser.add_argument('--workers', type=int, default=None,
+                                  help='extraction processes (default: all cores)')
+    reextract_parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                                  help='pages handed to a process at a time')
+
+    list_parser = subparsers.add_parser('list', help='print the URLs in an archive')
+    list_parser.add_argument('archive')
+    list_parser.add_argument('--source', choices=sorted(EXTRACTORS))
+
+    args = parser.parse_args()
+    if args.command == 'reextract':
+        reextract(args.archive, args.source, storage=args.storage, output_dir=args.output_dir,
+                  workers=args.workers, chunksize=args.chunksize)
+    elif args.command == 'list':
+        for headers, html in iter_records(archive_files(args.archive), args.source):
+            print(f"{headers.get('WARC-Date')}\t{headers.get('X-Fetch-Mode')}\t{len(html)}\t{headers.get('WARC-Target-URI')}")
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+
+from frontier import canonicalize_url
+
+# On-disk HTTP cache shared by the requests client and Scrapy.
+# Bodies are zlib-compressed files, metadata (status, headers, validators,
+# store and access times) lives in a SQLite index. Listing pages are served
+# from the cache while younger than their TTL; everything else is
+# revalidated with If-None-Match / If-Modified-Since, and a 304 is answered
+# from the stored body. Least recently used entries are evicted once the
+# cache grows past max_bytes.
+
+DEFAULT_CACHE_DIR = 'http_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_LISTING_TTL = 300
+
+# Paths that list articles rather than being one; these change often but a
+# few minutes of staleness is fine
+LISTING_PATTERNS = {
+    'coindesk.com': [r'^/$', r'^/(markets|business|tech|policy|opinion)/?$', r'^/tag/'],
+    'cointelegraph.com': [r'^/$', r'^/tags/', r'^/category/', r'^/press-releases/?$'],
+}
+
+def is_listing(url):
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    for site, patterns in LISTING_PATTERNS.items():
+        if host == site or host.endswith('.' + site):
+            return any(re.search(pattern, parts.path or '/') for pattern in patterns)
+    return False
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'hit': 0, 'miss': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+
+    def inc(self, name, count=1):
+        with self._lock:
+            self.counts[name] += count
+
+    def summary(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class HttpCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, listing_ttl=DEFAULT_LISTING_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.listing_ttl = listing_ttl
+        self.stats = CacheStats()
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                stored REAL NOT NULL,
+                accessed REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _body_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + '.z')
+
+    # Stored entry for a URL: status, headers ([name, value] pairs), body and
+    # store time; None when absent
+    def get(self, url):
+        key = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, stored FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (IOError, zlib.error) as e:
+            logging.warning(f"Dropping unreadable cache entry for {url}: {str(e)}")
+            self.delete(url)
+            return None
+        return {'status': row[0], 'headers': json.loads(row[1]), 'stored': row[2], 'body': body}
+
+    def put(self, url, status, headers, body):
+        key = canonicalize_url(url)
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(body, 6)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        headers = [[name, value] for name, value in headers]
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entries (key, url, status, headers, stored, accessed, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, url, status, json.dumps(headers), now, now, len(data)))
+            self._total += len(data) - (previous[0] if previous else 0)
+            self.stats.inc('stored')
+            self._evict()
+
+    # A 304 confirmed the stored copy; restart its freshness clock
+    def touch(self, url):
+        with self._lock:
+            now = time.time()
+            self._conn.execute('UPDATE entries SET stored = ?, accessed = ? WHERE key = ?',
+                               (now, now, canonicalize_url(url)))
+
+    def delete(self, url):
+        key = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._total -= row[0]
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            victims = self._conn.execute(
+                'SELECT key, size FROM entries ORDER BY accessed LIMIT 64'
+            ).fetchall()
+            if not victims:
+                break
+            for key, size in victims:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._total -= size
+                try:
+                    os.remove(self._body_path(key))
+                except OSError:
+                    pass
+                self.stats.inc('evicted')
+                if self._total <= self.max_bytes:
+                    break
+
+    # Listing pages younger than the TTL are served without a request
+    def is_fresh(self, url, entry):
+        return is_listing(url) and time.time() - entry['stored'] < self.listing_ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        for name, value in entry['headers']:
+            if name.lower() == 'etag':
+                headers['If-None-Match'] = value
+            elif name.lower() == 'last-modified':
+                headers['If-Modified-Since'] = value
+        return headers
+
+    def size(self):
+        return self._total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        logging.info(f"HTTP cache {self.root}: {self._total / 1024 / 1024:.1f} MiB stored, "
+                     f"{self.stats.counts['evicted']} entries evicted this run")
+
+
+# Responses that must not be stored
+def is_cacheable(status, headers):
+    cache_control = headers.get('Cache-Control', '') or ''
+    return status == 200 and 'no-store' not in cache_control.lower()
+
+
+# Scrapy HTTPCACHE_POLICY: RFC 2616 validation, plus TTL freshness for
+# listing pages and no caching of challenge or error pages
+class ListingTTLPolicy(RFC2616Policy):
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.listing_ttl = settings.getfloat('HTTP_CACHE_LISTING_TTL', DEFAULT_LISTING_TTL)
+
+    def should_cache_response(self, response, request):
+        if response.status != 200:
+            return False
+        if is_listing(response.url):
+            return b'no-store' not in response.headers.get('Cache-Control', b'').lower()
+        return super().should_cache_response(response, request)
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if is_listing(request.url):
+            stored = getattr(cachedresponse, '_cache_stored', 0)
+            if time.time() - stored < self.listing_ttl:
+                return True
+            # Stale: revalidate with If-None-Match/If-Modified-Since, as
+            # RFC2616Policy does, so an unchanged listing comes back as a 304
+            self._set_conditional_validators(request, cachedresponse)
+            return False
+        return super().is_cached_response_fresh(cachedresponse, request)
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        valid = super().is_cached_response_valid(cachedresponse, response, request)
+        # HttpCacheMiddleware only stores changed responses, so restart the
+        # freshness clock of an entry a 304 confirmed here
+        if valid and response.status == 304:
+            cachedresponse._cache.touch(request.url)
+        return valid
+
+
+# Scrapy HTTPCACHE_STORAGE backed by HttpCache
+class ScrapyCacheStorage:
+    def __init__(self, settings):
+        self.root = os.path.join(settings.get('HTTP_CACHE_DIR', DEFAULT_CACHE_DIR), 'scrapy')
+        self.max_bytes = settings.getint('HTTP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.listing_ttl = settings.getfloat('HTTP_CACHE_LISTING_TTL', DEFAULT_LISTING_TTL)
+
+    def open_spider(self, spider):
+        self.cache = HttpCache(self.root, self.max_bytes, self.listing_ttl)
+
+    def close_spider(self, spider):
+        self.cache.close()
+
+    def retrieve_response(self, spider, request):
+        entry = self.cache.get(request.url)
+        if entry is None:
+            return None
+        headers = Headers()
+        for name, value in entry['headers']:
+            headers.appendlist(name, value)
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=entry['body'])
+        response = respcls(url=request.url, headers=headers, status=entry['status'], body=entry['body'])
+        # For the policy: the entry's age, and the cache to touch on a 304.
+        # Attributes rather than headers, so spiders see the origin's headers.
+        response._cache_stored = entry['stored']
+        response._cache = self.cache
+        return response
+
+    def store_response(self, spider, request, response):
+        # Stored as received; HttpCompressionMiddleware decodes after the cache
+        headers = [
+            (name.decode('latin-1'), value.decode('latin-1'))
+            for name, values in response.headers.items() for value in values
+        ]
+        self.cache.put(request.url, response.status, headers, response.body)
+
+
+# hit / miss / revalidated counts recorded by Scrapy's HttpCacheMiddleware
+def scrapy_cache_summary(stats):
+    return {
+        'hit': stats.get_value('httpcache/hit', 0),
+        'miss': stats.get_value('httpcache/miss', 0),
+        'revalidated': stats.get_value('httpcache/revalidate', 0),
+        'stored': stats.get_value('httpcache/store', 0),
+    }
+
+
+# Settings enabling the cache for a CrawlerProcess
+def scrapy_cache_settings(root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, listing_ttl=DEFAULT_LISTING_TTL):
+    return {
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_POLICY': 'http_cache.ListingTTLPolicy',
+        'HTTPCACHE_STORAGE': 'http_cache.ScrapyCacheStorage',
+        'HTTP_CACHE_DIR': root,
+        'HTTP_CACHE_MAX_BYTES': max_bytes,
+        'HTTP_CACHE_LISTING_TTL': listing_ttl,
+    }
@@ -0,0 +1,221 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+from rate_control import parse_retry_after
+from http_cache import HttpCache, is_cacheable, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, DEFAULT_LISTING_TTL
+
+# Shared HTTP client for the plain (non-browser) fetchers.
+# One pooled session is reused by every caller so connections stay alive
+# between articles, and each URL is downloaded exactly once.
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    # urllib3 decodes br transparently when the brotli package is installed
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+}
+
+DEFAULT_TIMEOUT = 10
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+
+# Body is stored decoded, so these no longer describe it
+UNCACHED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_rate_controller = None
+
+
+def _build_session(pool_maxsize):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    retries = Retry(
+        total=2,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=['GET', 'HEAD']
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        max_retries=retries,
+        pool_block=False
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Size the connection pool to the number of concurrent fetchers.
+# Safe to call more than once; the old session is closed.
+def configure_session(pool_maxsize=POOL_MAXSIZE):
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = _build_session(max(1, int(pool_maxsize)))
+        return _session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(POOL_MAXSIZE)
+    return _session
+
+
+# Pace requests per domain with an adaptive RateController; None turns it off
+def configure_rate_control(controller=None):
+    global _rate_controller
+    _rate_controller = controller
+    return controller
+
+
+def rate_control_stats():
+    return _rate_controller.summary() if _rate_controller is not None else None
+
+
+# Every network request goes through here so rate control sees its outcome
+def _get(url, timeout, headers, stream=False):
+    if _rate_controller is None:
+        return get_session().get(url, headers=headers, timeout=timeout, stream=stream)
+
+    controller = _rate_controller.for_url(url)
+    controller.acquire()
+    started = time.monotonic()
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout, stream=stream)
+    except requests.RequestException:
+        controller.record(None)
+        raise
+    finally:
+        controller.release()
+    # urllib3 may already have retried a 429/503 after its Retry-After;
+    # those attempts still count against the domain
+    retries = getattr(response.raw, 'retries', None)
+    for attempt in (retries.history if retries else ()):
+        controller.record(attempt.status)
+    controller.record(response.status_code, time.monotonic() - started,
+                      parse_retry_after(response.headers.get('Retry-After')))
+    return response
+
+
+# Keep responses in an on-disk HTTP cache; root=None turns it off
+def configure_cache(root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, listing_ttl=DEFAULT_LISTING_TTL):
+    global _cache
+    close_cache()
+    if root:
+        _cache = HttpCache(os.path.join(root, 'requests'), max_bytes, listing_ttl)
+    return _cache
+
+
+def cache_stats():
+    return _cache.stats.summary() if _cache is not None else None
+
+
+def close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+# Build a Response from a cache entry, marked with how it was served. The
+# mark is an attribute rather than a header: CDNs send their own X-Cache.
+def _cached_response(url, entry, how):
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._served_from_cache = how
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = entry['body']
+    return response
+
+
+# 'HIT' or 'REVALIDATED' for a response served from the cache, else None
+def served_from_cache(response):
+    return getattr(response, '_served_from_cache', None)
+
+
+def _fetch_cached(url, timeout, headers):
+    entry = _cache.get(url)
+    if entry is not None and _cache.is_fresh(url, entry):
+        _cache.stats.inc('hit')
+        logging.debug(f"Cache hit for {url}")
+        return _cached_response(url, entry, 'HIT')
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(_cache.conditional_headers(entry))
+    response = _get(url, timeout, request_headers)
+
+    if response.status_code == 304 and entry is not None:
+        _cache.touch(url)
+        _cache.stats.inc('revalidated')
+        logging.debug(f"Revalidated {url}")
+        return _cached_response(url, entry, 'REVALIDATED')
+
+    response.raise_for_status()
+    _cache.stats.inc('miss')
+    if is_cacheable(response.status_code, response.headers):
+        _cache.put(url, response.status_code, [
+            (name, value) for name, value in response.headers.items()
+            if name.lower() not in UNCACHED_HEADERS
+        ], response.content)
+    return response
+
+
+def fetch(url, timeout=DEFAULT_TIMEOUT, headers=None):
+    if _cache is not None:
+        return _fetch_cached(url, timeout, headers)
+    response = _get(url, timeout, headers)
+    response.raise_for_status()
+    logging.debug(f"Fetched {url}: {len(response.content)} bytes "
+                  f"({response.headers.get('Content-Encoding', 'identity')})")
+    return response
+
+
+# Uncached streaming fetch for documents parsed while they download.
+# `response.raw` yields the decoded body; the caller closes the response.
+def fetch_stream(url, timeout=DEFAULT_TIMEOUT, headers=None):
+    response = _get(url, timeout, headers, stream=True)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    response.raw.decode_content = True
+    return response
+
+
+# Convenience wrapper returning the page text, or None on any failure
+def fetch_html(url, timeout=DEFAULT_TIMEOUT, headers=None):
+    try:
+        return fetch(url, timeout=timeout, headers=headers).text
+    except requests.RequestException as e:
+        logging.warning(f"Error fetching {url}: {str(e)}")
+        return None
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
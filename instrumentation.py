@@ -0,0 +1,230 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-stage latency and throughput metrics shared by both scrapers.
+# Each stage (HTTP fetch, Chrome startup, page wait, tree parse, trafilatura,
+# store write, ...) is timed into a fixed-bucket histogram, so memory stays
+# flat however long the run is. The same buckets give the p50/p95/p99
+# estimates in the JSON summary and the Prometheus text export. Counters and
+# byte totals sit alongside. Parser processes drain their metrics after
+# each job and the parent merges them, so nothing timed in a pool is lost.
+
+# Roughly 1.5x apart, which keeps the interpolated percentiles within ~20%
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.35, 0.5, 0.75,
+    1.0, 1.5, 2.5, 4.0, 6.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'crawler'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    # Estimate by linear interpolation inside the bucket holding the rank
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def state(self):
+        return {'counts': list(self.counts), 'count': self.count, 'sum': self.sum, 'max': self.max}
+
+    def merge(self, state):
+        self.counts = [a + b for a, b in zip(self.counts, state['counts'])]
+        self.count += state['count']
+        self.sum += state['sum']
+        self.max = max(self.max, state['max'])
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._bytes = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    # Time a block as `stage`; a block that raises also counts `{stage}/errors`
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f'{stage}/errors')
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def inc(self, name, count=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+
+    def add_bytes(self, stage, count):
+        with self._lock:
+            self._bytes[stage] = self._bytes.get(stage, 0) + count
+
+    # Picklable snapshot that also resets, for handing metrics from a worker
+    # process to the parent without counting anything twice
+    def drain(self):
+        with self._lock:
+            state = {
+                'stages': {stage: histogram.state() for stage, histogram in self._stages.items()},
+                'counters': self._counters,
+                'bytes': self._bytes,
+            }
+            self._stages = {}
+            self._counters = {}
+            self._bytes = {}
+        return state
+
+    def merge(self, state):
+        with self._lock:
+            for stage, histogram_state in state['stages'].items():
+                histogram = self._stages.get(stage)
+                if histogram is None:
+                    histogram = self._stages[stage] = Histogram()
+                histogram.merge(histogram_state)
+            for name, count in state['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + count
+            for stage, count in state['bytes'].items():
+                self._bytes[stage] = self._bytes.get(stage, 0) + count
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.time() - self.started
+            stages = {}
+            for stage, histogram in sorted(self._stages.items()):
+                entry = {
+                    'count': histogram.count,
+                    'total_seconds': round(histogram.sum, 3),
+                    'mean': round(histogram.sum / histogram.count, 4),
+                }
+                for q in QUANTILES:
+                    entry[f'p{int(q * 100)}'] = round(histogram.quantile(q), 4)
+                entry['max'] = round(histogram.max, 4)
+                entry['per_second'] = round(histogram.count / elapsed, 3) if elapsed else None
+                stages[stage] = entry
+            return {
+                'elapsed_seconds': round(elapsed, 1),
+                'stages': stages,
+                'counters': dict(sorted(self._counters.items())),
+                'bytes': dict(sorted(self._bytes.items())),
+            }
+
+    # Prometheus text exposition format (version 0.0.4)
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {METRIC_PREFIX}_stage_seconds Time spent per crawl stage')
+            lines.append(f'# TYPE {METRIC_PREFIX}_stage_seconds histogram')
+            for stage, histogram in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append(f'# HELP {METRIC_PREFIX}_events_total Crawl events by name')
+            lines.append(f'# TYPE {METRIC_PREFIX}_events_total counter')
+            for name, count in sorted(self._counters.items()):
+                lines.append(f'{METRIC_PREFIX}_events_total{{name="{name}"}} {count}')
+
+            lines.append(f'# HELP {METRIC_PREFIX}_bytes_total Bytes fetched per stage')
+            lines.append(f'# TYPE {METRIC_PREFIX}_bytes_total counter')
+            for stage, count in sorted(self._bytes.items()):
+                lines.append(f'{METRIC_PREFIX}_bytes_total{{stage="{stage}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+# Run `fn` in a worker process and return its result with the metrics it
+# recorded; the parent passes them to metrics.merge
+def call_with_metrics(fn, *args):
+    result = fn(*args)
+    return result, metrics.drain()
+
+
+def write_summary(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics.summary(), f, indent=2)
+    logging.info(f"Wrote metrics summary to {path}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = metrics.prometheus_text().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(metrics.summary()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Metrics endpoint: {format % args}")
+
+
+_server = None
+
+
+# Serve /metrics (Prometheus text) and /metrics.json from a background thread
+def serve_metrics(port, host='127.0.0.1'):
+    global _server
+    close_metrics_server()
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{_server.server_port}/metrics")
+    return _server
+
+
+def close_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,128 @@
+import logging
+import threading
+from urllib.parse import urlparse
+
+# Lean rendering for pages we only read text and counters from.
+# Images, media, fonts and third-party trackers are blocked through the
+# DevTools Network domain and pages load with the eager strategy (return at
+# DOMContentLoaded). Each site can switch it off, and per-page transfer
+# sizes are recorded so lean and full renders can be compared.
+
+# URL patterns standing in for each blockable resource type.
+# Network.setBlockedURLs matches on URL, so types are expressed as extensions.
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.mov*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'stylesheet': ['*.css*'],
+}
+
+LEAN_RENDERING = {
+    'cointelegraph.com': {
+        'enabled': True,
+        'page_load_strategy': 'eager',
+        'block_types': ['image', 'media', 'font'],
+        'block_patterns': [
+            '*googletagmanager.com*',
+            '*google-analytics.com*',
+            '*doubleclick.net*',
+            '*googlesyndication.com*',
+            '*facebook.net*',
+            '*hotjar.com*',
+            '*twitter.com/widgets*',
+            '*platform.twitter.com*',
+            '*youtube.com/embed*',
+        ],
+    },
+}
+
+# Sum of bytes transferred for the document and all of its subresources
+TRANSFER_SIZE_JS = """
+var entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+var total = 0;
+for (var i = 0; i < entries.length; i++) {
+    total += entries[i].transferSize || 0;
+}
+return {bytes: total, requests: entries.length};
+"""
+
+
+def lean_config(url_or_site, enabled=True):
+    if not enabled:
+        return None
+    host = (urlparse(url_or_site).hostname or url_or_site).lower()
+    for site, config in LEAN_RENDERING.items():
+        if host == site or host.endswith('.' + site):
+            return config if config.get('enabled') else None
+    return None
+
+
+def blocked_url_patterns(config):
+    patterns = []
+    for resource_type in config.get('block_types', []):
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    patterns.extend(config.get('block_patterns', []))
+    return patterns
+
+
+# Browser options that must be set before the browser starts
+def apply_lean_options(options, config):
+    if not config:
+        return options
+    options.page_load_strategy = config.get('page_load_strategy', 'eager')
+    if 'image' in config.get('block_types', []):
+        options.add_argument('--blink-settings=imagesEnabled=false')
+    return options
+
+
+# Install the DevTools URL block list on a running browser
+def enable_request_blocking(driver, config):
+    if not config:
+        return
+    patterns = blocked_url_patterns(config)
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        logging.debug(f"Blocking {len(patterns)} URL patterns")
+    except Exception as e:
+        logging.warning(f"Could not enable request blocking: {str(e)}")
+
+
+class RenderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+
+    def record(self, mode, seconds, transfer):
+        with self._lock:
+            entry = self._modes.setdefault(mode, {'pages': 0, 'seconds': 0.0, 'bytes': 0, 'requests': 0})
+            entry['pages'] += 1
+            entry['seconds'] += seconds
+            entry['bytes'] += transfer.get('bytes', 0)
+            entry['requests'] += transfer.get('requests', 0)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for mode, entry in self._modes.items():
+                pages = entry['pages']
+                result[mode] = {
+                    'pages': pages,
+                    'avg_seconds': round(entry['seconds'] / pages, 3),
+                    'avg_bytes': entry['bytes'] // pages,
+                    'avg_requests': round(entry['requests'] / pages, 1),
+                }
+            return result
+
+
+render_stats = RenderStats()
+
+
+def record_page_load(driver, mode, seconds):
+    try:
+        transfer = driver.execute_script(TRANSFER_SIZE_JS) or {}
+    except Exception as e:
+        logging.debug(f"Could not read transfer sizes: {str(e)}")
+        transfer = {}
+    render_stats.record(mode, seconds, transfer)
+    return transfer
@@ -0,0 +1,238 @@
+import atexit
+import json
+import logging
+import multiprocessing
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Logging for the scrapers, kept off the extraction hot path.
+# Callers only put records on an in-memory queue; a listener thread formats
+# them and writes to the console and log file, so slow disks and terminals
+# never block a fetch or parse. Levels can be set per module or per library
+# logger, DEBUG output is rate-limited per line of code, and records can be
+# written as JSON lines. Parser processes send their records to the same
+# listener through a multiprocessing queue.
+#
+# Levels are applied to the loggers themselves (and the root logger is
+# never left at NOTSET), so a disabled call returns before a record is made.
+# The scrapers log with f-strings, which are still formatted before that
+# check; loops that log per paragraph or dump page source guard on
+# debug_enabled() first.
+
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+# DEBUG records let through per second from any one line of code
+DEFAULT_DEBUG_RATE = 20
+# Chatty libraries stay quiet unless asked for
+DEFAULT_MODULE_LEVELS = {
+    'scrapy': 'INFO',
+    'twisted': 'ERROR',
+    'urllib3': 'WARNING',
+    'selenium': 'WARNING',
+    'undetected_chromedriver': 'WARNING',
+    'trafilatura': 'WARNING',
+    'htmldate': 'WARNING',
+    'charset_normalizer': 'WARNING',
+    'filelock': 'ERROR',
+    'asyncio': 'WARNING',
+}
+
+
+def _level(value):
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {value}")
+    return level
+
+
+# "scrape_cointelegraph=DEBUG,scrapy=WARNING" -> {'scrape_cointelegraph': 10, 'scrapy': 30}
+def parse_module_levels(spec):
+    levels = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        name, sep, level = part.partition('=')
+        if not sep:
+            raise ValueError(f"Expected module=LEVEL, got {part!r}")
+        levels[name.strip()] = _level(level.strip())
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Per-module thresholds. Records logged through the root logger (most of
+# this repo) are matched by the module they came from; records from named
+# loggers by the closest configured logger name.
+class ModuleLevelFilter(logging.Filter):
+    def __init__(self, level, levels):
+        super().__init__()
+        self.level = level
+        self.levels = levels
+
+    def filter(self, record):
+        if record.name == 'root':
+            return record.levelno >= self.levels.get(record.module, self.level)
+        name = record.name
+        while name:
+            if name in self.levels:
+                return record.levelno >= self.levels[name]
+            name = name.rpartition('.')[0]
+        return record.levelno >= self.level
+
+
+# At most `rate` DEBUG records per second from each line of code. The first
+# record let through afterwards says how many were dropped.
+class DebugRateLimit(logging.Filter):
+    def __init__(self, rate=DEFAULT_DEBUG_RATE):
+        super().__init__()
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        site = (record.pathname, record.lineno)
+        second = int(record.created)
+        with self._lock:
+            window, count, suppressed = self._sites.get(site, (second, 0, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= self.rate:
+                self._sites[site] = (window, count, suppressed + 1)
+                return False
+            self._sites[site] = (window, count + 1, 0)
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+_listener = None
+_queue_handler = None
+_process_queue = None
+_process_listener = None
+_config = None
+
+
+def _filters(config):
+    filters = [ModuleLevelFilter(config['level'], config['levels'])]
+    if config['debug_rate']:
+        filters.append(DebugRateLimit(config['debug_rate']))
+    return filters
+
+
+# Logger levels only; the filters above do the per-module part for records
+# that reach the root logger
+def apply_levels():
+    if _config is None:
+        return
+    root_level = min([_config['level']] + list(_config['requested'].values()))
+    logging.getLogger().setLevel(root_level)
+    for name, level in _config['levels'].items():
+        logging.getLogger(name).setLevel(level)
+
+
+def _install(handler, config):
+    global _config
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+        old.close()
+    for log_filter in _filters(config):
+        handler.addFilter(log_filter)
+    root.addHandler(handler)
+    _config = config
+    apply_levels()
+
+
+# Route all logging through a queue to console and/or file handlers run by
+# a listener thread. Replaces whatever handlers the root logger had.
+def configure_logging(level=DEFAULT_LEVEL, log_file=None, json_lines=False, module_levels=None,
+                      debug_rate=DEFAULT_DEBUG_RATE, console=True):
+    global _listener, _queue_handler
+    close_logging()
+
+    requested = {name: _level(value) for name, value in (module_levels or {}).items()}
+    levels = {name: _level(value) for name, value in DEFAULT_MODULE_LEVELS.items()}
+    levels.update(requested)
+    config = {'level': _level(level), 'levels': levels, 'requested': requested, 'debug_rate': debug_rate}
+
+    formatter = JsonFormatter() if json_lines else logging.Formatter(DEFAULT_FORMAT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+    _queue_handler = QueueHandler(records)
+    _install(_queue_handler, config)
+    return _listener
+
+
+def debug_enabled():
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+# Picklable settings for a spawned worker's init_worker_logging, or None
+# when configure_logging has not been called
+def worker_log_config():
+    global _process_queue, _process_listener
+    if _listener is None:
+        return None
+    if _process_queue is None:
+        _process_queue = multiprocessing.get_context('spawn').Queue()
+        _process_listener = QueueListener(_process_queue, *_listener.handlers)
+        _process_listener.start()
+    return dict(_config, queue=_process_queue)
+
+
+# Process-pool initializer: send this worker's records to the parent's listener
+def init_worker_logging(config):
+    if config is None:
+        return
+    _install(QueueHandler(config['queue']), config)
+
+
+# Stop the listeners after writing out everything queued
+def close_logging():
+    global _listener, _queue_handler, _process_queue, _process_listener, _config
+    if _process_listener is not None:
+        _process_listener.stop()
+        _process_queue.close()
+        _process_listener = None
+        _process_queue = None
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+        _config = None
+
+
+atexit.register(close_logging)
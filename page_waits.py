@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Readiness-driven waits for rendered pages.
+# Instead of sleeping a fixed amount after driver.get, poll until every
+# selector configured for the site and page kind is present, up to a hard
+# timeout. How long each wait actually took is recorded in `wait_stats`.
+
+POLL_FREQUENCY = 0.25
+
+# Per-site readiness conditions: every selector must match at least once.
+# A comma inside a selector means "any of these".
+SITE_CONDITIONS = {
+    'cointelegraph.com': {
+        'article': {
+            'selectors': [
+                'div.post__content, div.article-content, article',
+                'script[data-hid="ldjson-schema"]',
+                'span.text-black.text-13.font-semibold',
+            ],
+            'timeout': 20,
+        },
+        'listing': {
+            'selectors': ['article, .post-card-inline, .posts-listing'],
+            'timeout': 8,
+        },
+    },
+}
+
+# Checks all selectors in one WebDriver round-trip
+PRESENCE_JS = """
+return arguments[0].map(function (selector) {
+    return document.querySelector(selector) !== null;
+});
+"""
+
+
+def site_for(url):
+    host = (urlparse(url).hostname or '').lower()
+    for site in SITE_CONDITIONS:
+        if host == site or host.endswith('.' + site):
+            return site
+    return None
+
+
+def conditions_for(url, kind):
+    site = site_for(url)
+    if site is None:
+        return None, None
+    return site, SITE_CONDITIONS[site].get(kind)
+
+
+class WaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = {}
+
+    def record(self, site, kind, elapsed, ready, missing):
+        with self._lock:
+            entry = self._waits.setdefault((site, kind), {
+                'durations': [], 'timeouts': 0, 'missing': {}
+            })
+            entry['durations'].append(elapsed)
+            if not ready:
+                entry['timeouts'] += 1
+                for selector in missing:
+                    entry['missing'][selector] = entry['missing'].get(selector, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for (site, kind), entry in self._waits.items():
+                durations = sorted(entry['durations'])
+                count = len(durations)
+                result[f'{site}/{kind}'] = {
+                    'count': count,
+                    'mean': round(sum(durations) / count, 3),
+                    'p50': round(durations[int(count * 0.5)], 3),
+                    'p95': round(durations[min(count - 1, int(count * 0.95))], 3),
+                    'max': round(durations[-1], 3),
+                    'timeouts': entry['timeouts'],
+                    'missing': dict(entry['missing']),
+                }
+            return result
+
+
+wait_stats = WaitStats()
+
+
+# Block until the page is ready or the hard timeout expires.
+# Returns True when every condition was met.
+def wait_for_page(driver, url, kind='article', timeout=None):
+    site, conditions = conditions_for(url, kind)
+    if not conditions:
+        return True
+
+    selectors = conditions['selectors']
+    timeout = timeout or conditions['timeout']
+    missing = list(selectors)
+
+    def ready(d):
+        nonlocal missing
+        try:
+            found = d.execute_script(PRESENCE_JS, selectors)
+        except WebDriverException:
+            return False
+        missing = [s for s, present in zip(selectors, found) if not present]
+        return not missing
+
+    started = time.monotonic()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(ready)
+        is_ready = True
+    except TimeoutException:
+        is_ready = False
+    elapsed = time.monotonic() - started
+
+    wait_stats.record(site, kind, elapsed, is_ready, missing)
+    if is_ready:
+        logging.debug(f"{kind} page ready after {elapsed:.2f}s: {url}")
+    else:
+        logging.warning(f"{kind} page not ready after {elapsed:.2f}s, missing {missing}: {url}")
+    return is_ready
@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+# Adaptive per-domain rate control.
+# Each domain gets a token bucket (requests per second, with a small burst)
+# and a concurrency limit, both adjusted AIMD style: every `concurrency`
+# healthy responses add RATE_STEP to the rate and one concurrent request,
+# while 429/503 halve both and honour Retry-After. Other server errors,
+# timeouts and responses slower than the latency target back off more
+# gently. Scrapy uses it through AdaptiveRateMiddleware (download slot delay
+# and concurrency), the requests client through acquire/record/release.
+
+DEFAULT_LIMITS = {
+    'rate': 1.0,
+    'min_rate': 0.1,
+    'max_rate': 8.0,
+    'burst': 2,
+    'concurrency': 2,
+    'max_concurrency': 8,
+    'latency_target': 2.0,
+}
+
+SITE_LIMITS = {
+    'cointelegraph.com': {'rate': 0.5, 'max_rate': 2.0, 'max_concurrency': 4, 'latency_target': 3.0},
+    'coindesk.com': {'rate': 2.0, 'max_rate': 10.0, 'max_concurrency': 16},
+}
+
+THROTTLE_CODES = (429, 503)
+ERROR_CODES = (500, 502, 504, 520, 522, 524)
+
+RATE_STEP = 0.25
+THROTTLE_FACTOR = 0.5
+ERROR_FACTOR = 0.75
+SLOW_FACTOR = 0.9
+LATENCY_SMOOTHING = 0.3
+MAX_RETRY_AFTER = 600
+
+
+# Retry-After as seconds; accepts both delta-seconds and HTTP dates
+def parse_retry_after(value):
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class DomainController:
+    def __init__(self, domain, rate, min_rate, max_rate, burst, concurrency, max_concurrency, latency_target):
+        self.domain = domain
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._healthy = 0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.counts = {'responses': 0, 'throttled': 0, 'errors': 0, 'slow': 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    # Block until a request may be sent: not inside a Retry-After window,
+    # below the concurrency limit and with a token in the bucket
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self._in_flight >= self.concurrency:
+                    wait = None
+                elif self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    return
+                self._cond.wait(wait)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _decrease(self, factor):
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.concurrency = max(1, int(self.concurrency * factor))
+        self._healthy = 0
+
+    # Feed back one outcome: an HTTP status with its latency, or an error
+    # (timeout, connection failure) when status is None
+    def record(self, status=None, latency=None, retry_after=None):
+        with self._cond:
+            self.counts['responses'] += 1
+            if latency is not None:
+                self.latency = latency if self.latency is None else (
+                    LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency
+                )
+
+            if status in THROTTLE_CODES:
+                self.counts['throttled'] += 1
+                self._decrease(THROTTLE_FACTOR)
+                pause = retry_after if retry_after is not None else 1 / self.rate
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+                logging.warning(f"{self.domain} throttled ({status}), pausing {pause:.1f}s, "
+                                f"rate now {self.rate:.2f}/s x{self.concurrency}")
+            elif status is None or status in ERROR_CODES:
+                self.counts['errors'] += 1
+                self._decrease(ERROR_FACTOR)
+            elif self.latency is not None and self.latency > self.latency_target:
+                self.counts['slow'] += 1
+                self._decrease(SLOW_FACTOR)
+            else:
+                self._healthy += 1
+                if self._healthy >= self.concurrency:
+                    self._healthy = 0
+                    self.rate = min(self.max_rate, self.rate + RATE_STEP)
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._cond.notify_all()
+
+    # Seconds until the next request, as a Scrapy download slot delay
+    def delay(self):
+        with self._cond:
+            return max(1 / self.rate, self.blocked_until - time.monotonic())
+
+    def summary(self):
+        with self._cond:
+            return {
+                'rate': round(self.rate, 2),
+                'concurrency': self.concurrency,
+                'latency': round(self.latency, 3) if self.latency is not None else None,
+                **self.counts,
+            }
+
+
+class RateController:
+    # `share` scales every domain's rates and concurrency, for when several
+    # processes each run their own controller against the same sites
+    def __init__(self, site_limits=None, defaults=None, share=1.0):
+        self.site_limits = SITE_LIMITS if site_limits is None else site_limits
+        self.defaults = dict(DEFAULT_LIMITS, **(defaults or {}))
+        self.share = share
+        self._lock = threading.Lock()
+        self._domains = {}
+
+    def domain_for(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        for site in self.site_limits:
+            if host == site or host.endswith('.' + site):
+                return site
+        return host
+
+    def for_url(self, url):
+        domain = self.domain_for(url)
+        with self._lock:
+            controller = self._domains.get(domain)
+            if controller is None:
+                limits = dict(self.defaults, **self.site_limits.get(domain, {}))
+                for key in ('rate', 'min_rate', 'max_rate'):
+                    limits[key] *= self.share
+                for key in ('concurrency', 'max_concurrency'):
+                    limits[key] = max(1, int(limits[key] * self.share))
+                controller = DomainController(domain, **limits)
+                self._domains[domain] = controller
+            return controller
+
+    def summary(self):
+        with self._lock:
+            domains = dict(self._domains)
+        return {domain: controller.summary() for domain, controller in domains.items()}
+
+
+# Drives Scrapy's per-domain download slots from a RateController.
+# Enabled with RATE_CONTROL_ENABLED; replaces fixed DOWNLOAD_DELAY tuning
+# (AutoThrottle should stay off).
+class AdaptiveRateMiddleware:
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.controller = RateController()
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('RATE_CONTROL_ENABLED'):
+            raise NotConfigured
+        return cls(crawler)
+
+    def _slot(self, request, spider):
+        downloader = self.crawler.engine.downloader
+        # Same lookup AutoThrottle does; the slot appears after the first request
+        key = request.meta.get('download_slot') or downloader._get_slot_key(request, spider)
+        return downloader.slots.get(key)
+
+    def _apply(self, request, spider, controller):
+        slot = self._slot(request, spider)
+        if slot is not None:
+            slot.delay = controller.delay()
+            slot.concurrency = controller.concurrency
+
+    def process_request(self, request, spider):
+        self._apply(request, spider, self.controller.for_url(request.url))
+
+    def process_response(self, request, response, spider):
+        controller = self.controller.for_url(request.url)
+        # Cached responses say nothing about the server
+        if 'cached' not in response.flags:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            controller.record(response.status, request.meta.get('download_latency'), retry_after)
+            if response.status in THROTTLE_CODES:
+                self.crawler.stats.inc_value(f'rate_control/{controller.domain}/throttled')
+        self._apply(request, spider, controller)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        controller = self.controller.for_url(request.url)
+        controller.record(None)
+        self.crawler.stats.inc_value(f'rate_control/{controller.domain}/errors')
+        self._apply(request, spider, controller)
+
+    def spider_closed(self, spider):
+        for domain, summary in self.controller.summary().items():
+            spider.logger.info(f"Rate control {domain}: {summary}")
@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+
+import http_client
+from backfill import url_section_and_day
+from extraction_engine import run_extractions, DEFAULT_TIMEOUT, DEFAULT_WORKERS
+from frontier import Frontier, canonicalize_url, EXTRACTED, DEFAULT_PATH as DEFAULT_FRONTIER_PATH
+from html_archive import configure_archive, close_archive, DEFAULT_ARCHIVE_DIR, EXTRACTORS
+from http_cache import DEFAULT_CACHE_DIR
+from rate_control import RateController
+
+# Change-aware revisits of articles that were already extracted.
+# Every extracted article gets a recrawl row next to its crawl state: a hash
+# of its content, when it is next due, and how often it was checked and
+# found changed. The interval adapts per article. A change halves it, a
+# check with unchanged content (even if only the view and share counters
+# moved) doubles it, and it never exceeds a ceiling that grows
+# with the article's age. Fresh stories are revisited within hours, old
+# ones every few weeks, and articles past max_age are retired. A due batch
+# is refetched with the scraper's recrawl hook (`recrawl_article_record`,
+# else the backfill hook `fetch_article_record`), and a new version is
+# written to the article store only when the content hash differs from the
+# stored one.
+
+RECRAWL_SOURCES = {
+    'coindesk': {
+        # Fields that are not the article's content and never make a new version
+        'ignored': ('url', 'crawl_time', 'duplicate_of', 'duplicate_distance'),
+        'counters': (),
+        'client_side': (),
+    },
+    'cointelegraph': {
+        # "3 hours ago" is turned into a timestamp at crawl time, so
+        # time_published drifts between fetches of the same page
+        'ignored': ('url', 'crawl_time', 'freshness', 'time_published', 'duplicate_of', 'duplicate_distance'),
+        # Counters that keep moving mark an article as active without being a new version
+        'counters': ('views', 'shares'),
+        # Often rendered client-side, so the static refetch may not see them.
+        # They are not hashed as content, and when missing are carried over
+        # from the stored version.
+        'client_side': ('author', 'views', 'shares'),
+    },
+}
+
+HOUR = 3600
+DAY = 24 * HOUR
+# Longest interval for an article younger than the given age
+AGE_CEILINGS = (
+    (DAY, 2 * HOUR),
+    (7 * DAY, 12 * HOUR),
+    (30 * DAY, 3 * DAY),
+)
+OLD_CEILING = 30 * DAY
+MIN_INTERVAL = 30 * 60
+BACKOFF = 2.0
+# A failed fetch is retried after this long, however long the interval is
+RETRY_DELAY = 2 * HOUR
+DEFAULT_MAX_AGE_DAYS = 180
+DEFAULT_LIMIT = 500
+
+CHANGED = 'changed'
+ACTIVE = 'active'
+UNCHANGED = 'unchanged'
+# First check of an article whose saved record could not be read
+BASELINE = 'baseline'
+
+PUBLISHED_FIELDS = ('published_time', 'time_published')
+PUBLISHED_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+def _digest(values):
+    return hashlib.sha256(json.dumps(values, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+# (content hash, counters hash) of an article record. The counters hash is
+# None when the record has no counters.
+def record_hashes(source, record):
+    config = RECRAWL_SOURCES[source]
+    skipped = set(config['ignored']) | set(config['counters']) | set(config['client_side'])
+    content = {key: value for key, value in record.items() if key not in skipped}
+    counters = {key: record[key] for key in config['counters'] if key in record}
+    return _digest(content), _digest(counters) if counters else None
+
+
+# Publication time as a timestamp: from a dated URL, else the record's own
+# date field. CoinDesk writes "May 1, 2024 at 9:15 a.m. UTC".
+def published_at(url, record=None):
+    _, day = url_section_and_day(url)
+    if day is not None:
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+    for field in PUBLISHED_FIELDS:
+        value = str((record or {}).get(field) or '').split(' at ')[0].strip()
+        for fmt in PUBLISHED_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def age_ceiling(age):
+    for max_age, ceiling in AGE_CEILINGS:
+        if age < max_age:
+            return ceiling
+    return OLD_CEILING
+
+
+# Interval until the next check after an outcome
+def next_interval(interval, age, outcome):
+    ceiling = age_ceiling(age)
+    if outcome == CHANGED:
+        interval /= BACKOFF
+    elif outcome in (UNCHANGED, ACTIVE):
+        interval *= BACKOFF
+    return max(MIN_INTERVAL, min(interval, ceiling))
+
+
+class RecrawlSchedule(Frontier):
+    def __init__(self, path=DEFAULT_FRONTIER_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        super().__init__(path)
+        self.max_age = max_age_days * DAY
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS recrawl (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                published REAL NOT NULL,
+                content_hash TEXT,
+                counters_hash TEXT,
+                interval REAL NOT NULL,
+                next_check REAL,
+                checks INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                last_checked REAL,
+                last_changed REAL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS recrawl_due ON recrawl (source, next_check)')
+
+    def _next_check(self, published, interval, now):
+        if now - published > self.max_age:
+            return None
+        return now + interval
+
+    # Enrol extracted articles that have no recrawl row yet. The first check
+    # is spread over the article's interval so an old archive is not
+    # refetched all at once. `stored` returns the saved record (or None) to
+    # take the baseline hashes from.
+    def sync(self, source, stored):
+        now = time.time()
+        rows = self._conn.execute("""
+            SELECT u.url, u.fetch_url, u.first_seen FROM urls u
+            LEFT JOIN recrawl r ON r.url = u.url
+            WHERE u.source = ? AND u.state = ? AND r.url IS NULL
+        """, (source, EXTRACTED)).fetchall()
+        enrolled = 0
+        with self.batch():
+            for key, fetch_url, first_seen in rows:
+                record = stored(fetch_url)
+                published = published_at(fetch_url, record) or first_seen
+                content_hash, counters_hash = record_hashes(source, record) if record else (None, None)
+                interval = age_ceiling(now - published)
+                next_check = self._next_check(published, interval * random.uniform(0.1, 1.0), now)
+                self._conn.execute("""
+                    INSERT INTO recrawl (url, source, published, content_hash, counters_hash, interval, next_check)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (key, source, published, content_hash, counters_hash, interval, next_check))
+                enrolled += 1
+        return enrolled
+
+    # Articles due for a check, those that changed most often first
+    def due(self, source, limit=DEFAULT_LIMIT):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT u.fetch_url FROM recrawl r JOIN urls u ON u.url = r.url
+                WHERE r.source = ? AND r.next_check <= ?
+                ORDER BY (r.changes + 1.0) / (r.checks + 1.0) DESC, r.next_check
+                LIMIT ?
+            """, (source, time.time(), int(limit))).fetchall()
+        return [row[0] for row in rows]
+
+    # Book the outcome of one check. Returns CHANGED, ACTIVE, UNCHANGED or
+    # BASELINE, or None when the fetch failed.
+    def record_check(self, url, source, record):
+        key = canonicalize_url(url)
+        now = time.time()
+        with self.batch():
+            row = self._conn.execute(
+                'SELECT published, content_hash, counters_hash, interval FROM recrawl WHERE url = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            published, content_hash, counters_hash, interval = row
+            if record is None:
+                self._conn.execute('UPDATE recrawl SET next_check = ? WHERE url = ?',
+                                   (self._next_check(published, min(interval, RETRY_DELAY), now), key))
+                return None
+
+            new_content, new_counters = record_hashes(source, record)
+            if content_hash is None:
+                outcome = BASELINE
+            elif new_content != content_hash:
+                outcome = CHANGED
+            elif new_counters is not None and new_counters != counters_hash:
+                outcome = ACTIVE
+            else:
+                outcome = UNCHANGED
+            interval = next_interval(interval, now - published, outcome)
+            self._conn.execute("""
+                UPDATE recrawl SET content_hash = ?, counters_hash = COALESCE(?, counters_hash),
+                    interval = ?, next_check = ?,
+                    checks = checks + 1, changes = changes + ?, last_checked = ?,
+                    last_changed = CASE WHEN ? THEN ? ELSE last_changed END
+                WHERE url = ?
+            """, (new_content, new_counters, interval, self._next_check(published, interval, now),
+                  outcome == CHANGED, now, outcome == CHANGED, now, key))
+        return outcome
+
+    def recrawl_counts(self, source):
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT COUNT(*), COUNT(next_check), SUM(next_check <= ?), SUM(checks), SUM(changes)
+                FROM recrawl WHERE source = ?
+            """, (time.time(), source)).fetchone()
+        tracked, scheduled, due, checks, changes = row
+        return {'tracked': tracked, 'retired': tracked - scheduled, 'due': due or 0,
+                'checks': checks or 0, 'changes': changes or 0}
+
+
+def recrawl(source, frontier_path=DEFAULT_FRONTIER_PATH, storage='files', output_dir=None,
+            limit=DEFAULT_LIMIT, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+            max_age_days=DEFAULT_MAX_AGE_DAYS):
+    extractor = importlib.import_module(EXTRACTORS[source])
+    fetch_record = getattr(extractor, 'recrawl_article_record', extractor.fetch_article_record)
+    client_side = RECRAWL_SOURCES[source]['client_side']
+    schedule = RecrawlSchedule(frontier_path, max_age_days=max_age_days)
+    store = extractor.open_article_store(storage, output_dir)
+    counts = {CHANGED: 0, ACTIVE: 0, UNCHANGED: 0, BASELINE: 0, 'failed': 0}
+    started = time.monotonic()
+
+    def on_result(index, url, record):
+        outcome = schedule.record_check(url, source, record)
+        if outcome is None:
+            counts['failed'] += 1
+            return
+        counts[outcome] += 1
+        # Without a baseline the saved copy may be stale, so it is replaced once
+        if outcome in (CHANGED, BASELINE):
+            missing = [field for field in client_side if field not in record]
+            if missing:
+                previous = store.get(url) or {}
+                record = {**record, **{field: previous[field] for field in missing if field in previous}}
+            location = store.save(url, record)
+            logging.info(f"Saved new version of {url} to {location}")
+
+    try:
+        enrolled = schedule.sync(source, store.get)
+        if enrolled:
+            logging.info(f"Scheduled {enrolled} newly extracted {source} articles for recrawl")
+        urls = schedule.due(source, limit)
+        logging.info(f"{len(urls)} {source} articles due for a recheck")
+        run_extractions(urls, fetch_record, max_workers=workers, timeout=timeout,
+                        on_result=on_result)
+    finally:
+        store.close()
+        logging.info(f"Recrawl schedule: {json.dumps(schedule.recrawl_counts(source))}")
+        schedule.close()
+
+    logging.info(f"Recrawl of {source} finished in {time.monotonic() - started:.1f}s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    parser = argparse.ArgumentParser(description='Revisit extracted articles and store the ones that changed')
+    parser.add_argument('--sources', nargs='+', choices=sorted(RECRAWL_SOURCES), default=['coindesk'])
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='most articles rechecked per source')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='articles fetched in parallel')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='seconds allowed per article before giving up')
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help='articles published longer ago than this are no longer rechecked')
+    parser.add_argument('--storage', choices=['files', 'segments'], default='files')
+    parser.add_argument('--output-dir', help='defaults to the scraper\'s own output directory')
+    parser.add_argument('--state', default=DEFAULT_FRONTIER_PATH, help='crawl-state database')
+    parser.add_argument('--http-cache', default=DEFAULT_CACHE_DIR,
+                        help='revalidate pages against this cache, so unchanged ones come back as 304s')
+    parser.add_argument('--no-http-cache', action='store_true', help='fetch every page in full')
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR,
+                        help='keep the raw HTML of every fetched page here')
+    parser.add_argument('--no-archive', action='store_true', help='do not keep raw HTML')
+    args = parser.parse_args()
+
+    http_client.configure_session(pool_maxsize=args.workers)
+    http_client.configure_rate_control(RateController())
+    if not args.no_http_cache:
+        http_client.configure_cache(args.http_cache)
+    try:
+        for source in args.sources:
+            if not args.no_archive:
+                configure_archive(args.archive_dir, prefix=f'{source}-recrawl')
+            try:
+                recrawl(source, frontier_path=args.state, storage=args.storage, output_dir=args.output_dir,
+                        limit=args.limit, workers=args.workers, timeout=args.timeout,
+                        max_age_days=args.max_age_days)
+            finally:
+                close_archive()
+    finally:
+        if not args.no_http_cache:
+            http_client.close_cache()
+        http_client.close_session()
@@ -1,140 +1,174 @@
 import trafilatura
-import requests
-from bs4 import BeautifulSoup
-from scrapy import Spider, Request
+from scrapy import Spider
 from scrapy.crawler import CrawlerProcess
+from twisted.internet import reactor, threads
+from twisted.internet.defer import Deferred
+from twisted.python.threadpool import ThreadPool
 import json
-import os
-import re
 from datetime import datetime
 import logging
 import traceback
-import sys
+import time
+import argparse
 
-# Add at the top of the file
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler('scraper_debug.log'),
-        logging.StreamHandler()
-    ]
+import http_client
+from document import Document
+from article_store import open_store
+from rate_control import RateController
+from discovery import discover, is_article_url
+from http_cache import scrapy_cache_settings, scrapy_cache_summary, DEFAULT_CACHE_DIR, DEFAULT_LISTING_TTL
+from html_archive import archive_page, configure_archive, close_archive, DEFAULT_ARCHIVE_DIR
+from frontier import Frontier, EXTRACTED, FAILED, DEFAULT_PATH as DEFAULT_FRONTIER_PATH
+from instrumentation import metrics, call_with_metrics, serve_metrics, close_metrics_server, write_summary
+from dedup import configure_dedup, dedup_store, close_dedup, MODES as DEDUP_MODES, DEFAULT_PATH as DEFAULT_DEDUP_PATH
+from log_setup import configure_logging, apply_levels, parse_module_levels, debug_enabled, DEFAULT_DEBUG_RATE
+from coordination import open_queue, run_worker, DEFAULT_BATCH_SIZE as DEFAULT_LEASE_BATCH, DEFAULT_LEASE_SECONDS
+from extraction_engine import (
+    run_extractions, run_pipeline, create_process_pool,
+    DEFAULT_WORKERS, DEFAULT_TIMEOUT, DEFAULT_PROCESSES, DEFAULT_CHUNKSIZE
 )
 
-# Extract content function
-def extract_content(url):
+SOURCE = 'coindesk'
+OUTPUT_DIR = "extracted_articles/coindesk"
+SEGMENT_DIR = "extracted_articles/segments/coindesk"
+DEFAULT_STORAGE = 'files'
+
+# Crawl-state updates committed per transaction
+STATE_BATCH_SIZE = 50
+
+# I/O stage: download one article. Returns (UTF-8 HTML bytes, crawl time),
+# which is all the CPU stage needs, or None when the fetch failed.
+def fetch_article(url):
     try:
         crawl_time = datetime.utcnow().isoformat()
-        logging.info(f"Starting extraction at {crawl_time}")
+        logging.debug(f"Starting extraction for URL: {url}")
         
-        print(f"\n{'='*50}")  # Visual separator
-        logging.info(f"Starting extraction for URL: {url}")
+        # Step 1: Download HTML once through the shared pooled session
+        with metrics.timer('http_fetch'):
+            response = http_client.fetch(url, timeout=10)
+        # Cache hits and 304s are served from disk rather than the network
+        cached = http_client.served_from_cache(response)
+        metrics.add_bytes('http_cache' if cached else 'http', len(response.content))
+        downloaded = response.text
+        logging.debug(f"Downloaded HTML length: {len(downloaded)} characters")
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        # Keep the raw page so it can be re-extracted without re-crawling;
+        # a page served from the cache was archived when it was downloaded
+        if not cached:
+            with metrics.timer('archive_write'):
+                archive_page(url, downloaded, SOURCE, 'http', response.status_code)
         
-        # Step 1: Download HTML
-        logging.info("Fetching URL with requests...")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        html_content = response.text
-        logging.info(f"Downloaded HTML length: {len(html_content)} characters")
+    except Exception as e:
+        logging.error(f"Error extracting content from {url}: {str(e)}")
+        logging.error(traceback.format_exc())
+        return None
+    
+    return downloaded.encode('utf-8'), crawl_time
+
+# CPU stage: runs in a parser process when extraction uses a process pool
+def parse_article(url, fetched):
+    html, crawl_time = fetched
+    with metrics.timer('parse'):
+        return extract_from_html(url, html, crawl_time)
+
+# Extract content function. With a crawl-state store the download is
+# recorded as FETCHED before parsing, as the Cointelegraph spider does.
+def extract_content(url, frontier=None):
+    fetched = fetch_article(url)
+    if fetched is None:
+        return None
+    if frontier is not None:
+        frontier.mark_fetched(url)
+    return parse_article(url, fetched)
+
+# Steps 2-3 of extract_content, on HTML that has already been downloaded
+def extract_from_html(url, downloaded, crawl_time=None):
+    try:
+        crawl_time = crawl_time or datetime.utcnow().isoformat()
         
-        # Step 2: Trafilatura fetch
-        logging.info("Fetching URL with trafilatura...")
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            logging.info("Trafilatura fetch successful")
-        else:
-            logging.warning("Trafilatura fetch failed, using requests response")
-            downloaded = html_content
+        # Parse once; trafilatura, metadata and the selectors share this tree
+        with metrics.timer('tree_parse'):
+            doc = Document(downloaded, url=url)
         
-        # Step 3: Extract content
-        logging.info("Extracting content with trafilatura...")
-        extracted_content = trafilatura.extract(
-            downloaded,
-            include_comments=False,
-            include_tables=True,
-            no_fallback=False,
-            output_format='txt'
-        )
+        # Step 2: Extract content (trafilatura cleans its own copy of the tree)
+        with metrics.timer('trafilatura'):
+            extracted_content = trafilatura.extract(
+                doc.tree,
+                include_comments=False,
+                include_tables=True,
+                no_fallback=False,
+                output_format='txt'
+            )
         
         if extracted_content:
-            logging.info(f"Extracted content length: {len(extracted_content)} characters")
-            logging.info("First 200 characters of content:")
-            logging.info(extracted_content[:200])
+            if debug_enabled():
+                logging.debug(f"Extracted content length: {len(extracted_content)} characters")
+                logging.debug(f"First 200 characters of content: {extracted_content[:200]}")
         else:
             logging.error("No content extracted!")
             return None
             
-        # Step 4: Get metadata
-        logging.info("Extracting metadata...")
-        metadata = trafilatura.metadata.extract_metadata(downloaded)
+        # Step 3: Get metadata
+        with metrics.timer('metadata'):
+            metadata = trafilatura.metadata.extract_metadata(doc.tree, default_url=url)
+        selectors_started = time.perf_counter()
         
         published_time = None
         updated_time = None
         author = None
         editor = None
         
-        # Parse HTML for CoinDesk specific date formats
-        soup = BeautifulSoup(downloaded, 'html.parser')
-        
         # Add title extraction
         title = None
 
         # Try to get title from article header
-        title_element = soup.find('h1', class_='at-headline')
-        if title_element:
-            title = title_element.text.strip()
-            logging.info(f"Found title from header: {title}")
+        title = doc.select_text('h1.at-headline')
+        if title:
+            logging.debug(f"Found title from header: {title}")
 
         # Fallback to metadata title
         if not title and metadata and metadata.title:
             title = metadata.title.strip()
-            logging.info(f"Found title from metadata: {title}")
+            logging.debug(f"Found title from metadata: {title}")
 
         # Fallback to HTML title tag
         if not title:
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.text.strip()
-                logging.info(f"Found title from title tag: {title}")
+            title = doc.select_text('title')
+            if title:
+                logging.debug(f"Found title from title tag: {title}")
         
         # Extract editor
-        editor_element = soup.find('p', class_='kDZZDY')
-        if editor_element:
-            editor_text = editor_element.text
+        editor_element = doc.select_one('p.kDZZDY')
+        if editor_element is not None:
+            editor_text = editor_element.text_content()
             # Extract name after "Edited by"
             if "Edited by" in editor_text:
                 editor = editor_text.split("Edited by")[-1].strip().rstrip('.')
-                logging.info(f"Found editor: {editor}")
+                logging.debug(f"Found editor: {editor}")
         
         # Extract published time
-        published_element = soup.find('div', {'class': 'at-created'})
-        if published_element:
-            published_text = published_element.find('span', {'class': 'iOUkmj'})
-            if published_text:
-                published_time = published_text.text.strip()
-                logging.info(f"Found published time: {published_time}")
+        published_element = doc.select_one('div.at-created')
+        if published_element is not None:
+            published_time = doc.select_text('span.iOUkmj', root=published_element)
+            if published_time:
+                logging.debug(f"Found published time: {published_time}")
         
         # Extract updated time
-        updated_element = soup.find('div', {'class': 'at-updated'})
-        if updated_element:
-            updated_text = updated_element.find('span', {'class': 'iOUkmj'})
-            if updated_text:
-                updated_time = updated_text.text.replace('Updated', '').strip()
-                logging.info(f"Found updated time: {updated_time}")
+        updated_element = doc.select_one('div.at-updated')
+        if updated_element is not None:
+            updated_text = doc.select_one('span.iOUkmj', root=updated_element)
+            if updated_text is not None:
+                updated_time = updated_text.text_content().replace('Updated', '').strip()
+                logging.debug(f"Found updated time: {updated_time}")
         
         # Extract author
-        author_element = soup.find('a', href=lambda x: x and '/author/' in x)
-        if author_element:
-            author = author_element.text.strip()
-            logging.info(f"Found author: {author}")
+        author = doc.select_text('a[href*="/author/"]')
+        if author:
+            logging.debug(f"Found author: {author}")
         
         # Fallback to metadata if direct HTML parsing fails
         if not any([published_time, updated_time, author]) and metadata:
-            logging.info("Using metadata fallback...")
+            logging.debug("Using metadata fallback")
             if not published_time:
                 published_time = str(metadata.date) if metadata.date else None
             if not updated_time:
@@ -152,8 +186,9 @@ def extract_content(url):
             "url": url,
             "crawl_time": crawl_time
         }
+        metrics.observe('selectors', time.perf_counter() - selectors_started)
         
-        logging.info("Extraction completed successfully")
+        logging.info(f"Extracted {url}")
         return result
         
     except Exception as e:
@@ -161,113 +196,428 @@ def extract_content(url):
         logging.error(traceback.format_exc())
         return None
 
-# Generalized Scrapy Spider to crawl articles
+# Backfill hook used by backfill.py
+def fetch_article_record(url):
+    return extract_content(url)
+
+# Re-extraction hook used by html_archive.py
+def reextract_record(url, html, fetched_at=None):
+    return extract_from_html(url, html, fetched_at.isoformat() if fetched_at else None)
+
+# Generalized Scrapy Spider to crawl articles. It only discovers: with a
+# shared queue its finds are queued by process_pending, which is the worker.
+# Streaming extraction does not go through the queue, so --stream and
+# --queue cannot be combined.
 class GeneralSpider(Spider):
     name = 'general_spider'
     allowed_domains = ['coindesk.com']
     start_urls = ['https://www.coindesk.com/']
     
-    def __init__(self):
-        super().__init__()
-        self.seen_urls = set()
-        # Use today's date for the output file
-        self.date = datetime.now().strftime('%Y-%m-%d')
-        self.output_file = f'articles_{self.date}.json'
-        
-        # Create or clear the output file
-        with open(self.output_file, 'w') as f:
-            pass
+    def __init__(self, frontier_path=DEFAULT_FRONTIER_PATH, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Discovered URLs go straight into the persistent crawl-state store,
+        # which skips articles processed in earlier runs
+        self.frontier = Frontier(frontier_path)
 
     def parse(self, response):
         logging.info(f"Parsing page: {response.url}")
+        metrics.inc('spider/pages')
+        metrics.add_bytes('spider_cache' if 'cached' in response.flags else 'spider', len(response.body))
         
-        article_links = response.css('a[href*="/2024/"]::attr(href), a[href*="/2023/"]::attr(href)').getall()
+        article_links = response.css('a::attr(href)').getall()
         
-        try:
-            with open(self.output_file, 'a') as f:
-                for href in article_links:
-                    full_url = response.urljoin(href)
-                    if (re.search(r'/(?:markets|business|tech|opinion)/\d{4}/\d{2}/\d{2}/', full_url) 
-                        and full_url not in self.seen_urls):
-                        logging.info(f"Found new matching article URL: {full_url}")
-                        json.dump({'url': full_url, 'processed': False}, f)
-                        f.write('\n')
-                        self.seen_urls.add(full_url)
-        except IOError as e:
-            logging.error(f"Error writing to {self.output_file}: {str(e)}")
+        new_urls = []
+        with self.frontier.batch():
+            for href in article_links:
+                full_url = response.urljoin(href)
+                if is_article_url(SOURCE, full_url) and self.frontier.schedule(full_url, SOURCE):
+                    logging.info(f"Found new matching article URL: {full_url}")
+                    new_urls.append(full_url)
+        
+        # Picked up by StreamingExtractionPipeline when streaming is enabled
+        for url in new_urls:
+            yield {'url': url}
+
+    def closed(self, reason):
+        if self.crawler.settings.getbool('HTTPCACHE_ENABLED'):
+            logging.info(f"HTTP cache (spider): {json.dumps(scrapy_cache_summary(self.crawler.stats))}")
+        logging.info(f"Crawl state: {self.frontier.counts(SOURCE)}")
+        self.frontier.close()
+
+# Build the per-article file name from the URL's date and slug
+def article_filename(url, record=None):
+    url_parts = url.rstrip('/').split('/')
+    date_str = f"{url_parts[-4]}-{url_parts[-3]}-{url_parts[-2]}"
+    article_name = url_parts[-1]
+    return f"{date_str}_{article_name}.json"
+
+def open_article_store(storage=DEFAULT_STORAGE, root=None):
+    if root is None:
+        root = OUTPUT_DIR if storage == 'files' else SEGMENT_DIR
+    # Near-duplicates are flagged or skipped here when deduplication is on
+    return dedup_store(open_store(storage, root, filename_fn=article_filename, indent=2), SOURCE)
+
+# Write one extracted article; returns the crawl-state update for it
+def save_article(url, content, store):
+    if not content:
+        logging.error(f"Failed to extract content from {url}")
+        metrics.inc('articles/failed')
+        return (url, FAILED, 'no content extracted')
+    try:
+        with metrics.timer('store_write'):
+            location = store.save(url, content)
+        if location is not None:
+            logging.info(f"Saved content to {location}")
+        metrics.inc('articles/extracted')
+        return (url, EXTRACTED, None)
+    except IOError as e:
+        logging.error(f"Error saving content for {url}: {str(e)}")
+        metrics.inc('articles/failed')
+        return (url, FAILED, str(e))
+
+# Fetch, extract and store one article; runs on an extraction thread.
+# With a process pool the parsing is handed to it and the thread only waits.
+def extract_and_save(url, store, cpu=None, frontier=None):
+    if cpu is None:
+        return save_article(url, extract_content(url, frontier), store)
+    fetched = fetch_article(url)
+    content = None
+    if fetched:
+        if frontier is not None:
+            frontier.mark_fetched(url)
+        content, worker_metrics = cpu.submit(call_with_metrics, parse_article, url, fetched).result()
+        metrics.merge(worker_metrics)
+    return save_article(url, content, store)
+
+# Item pipeline that extracts articles while GeneralSpider is still discovering.
+# Each item is handed to a bounded thread pool and process_item returns the
+# deferred, so Scrapy's CONCURRENT_ITEMS and scraper slot limits hold discovery
+# back whenever extraction falls behind. An item that times out releases its
+# slot, but its crawl state is only booked once the thread finishes, since a
+# thread cannot be cancelled and may still save the article.
+class StreamingExtractionPipeline:
+    def __init__(self, storage, output_dir, workers, timeout, frontier_path, batch_size, processes=0):
+        self.storage = storage
+        self.output_dir = output_dir
+        self.workers = workers
+        self.processes = processes
+        self.timeout = timeout
+        self.frontier_path = frontier_path
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            storage=settings.get('EXTRACTION_STORAGE', DEFAULT_STORAGE),
+            output_dir=settings.get('EXTRACTION_OUTPUT_DIR'),
+            workers=settings.getint('EXTRACTION_WORKERS', DEFAULT_WORKERS),
+            timeout=settings.getfloat('EXTRACTION_TIMEOUT', DEFAULT_TIMEOUT),
+            frontier_path=settings.get('CRAWL_STATE_PATH', DEFAULT_FRONTIER_PATH),
+            batch_size=settings.getint('CRAWL_STATE_BATCH_SIZE', STATE_BATCH_SIZE),
+            processes=settings.getint('EXTRACTION_PROCESSES', 0)
+        )
+
+    def open_spider(self, spider):
+        self.store = open_article_store(self.storage, self.output_dir)
+        self.frontier = Frontier(self.frontier_path)
+        self.updates = []
+        self.threads = ThreadPool(minthreads=0, maxthreads=self.workers, name='extract')
+        self.threads.start()
+        # Optional CPU stage shared by the extraction threads
+        self.cpu = create_process_pool(self.processes) if self.processes > 0 else None
+
+    # Waiting for the extraction threads blocks, so it is done off the reactor
+    # thread. Their outcomes reach the reactor before this deferred fires.
+    def close_spider(self, spider):
+        d = threads.deferToThread(self.stop_workers)
+        d.addCallback(lambda _: self.close_stores())
+        return d
+
+    def stop_workers(self):
+        self.threads.stop()
+        if self.cpu is not None:
+            self.cpu.shutdown(wait=True)
+
+    def close_stores(self):
+        self.flush()
+        self.store.close()
+        self.frontier.close()
+
+    # Buffered articles are written out before their state is committed,
+    # so a crash never leaves EXTRACTED rows without a stored record
+    def flush(self):
+        if self.updates:
+            self.store.flush()
+            self.frontier.update_many(self.updates)
+            self.updates.clear()
+
+    def record(self, update):
+        self.updates.append(update)
+        if len(self.updates) >= self.batch_size:
+            self.flush()
+
+    def process_item(self, item, spider):
+        url = item['url']
+        
+        # Skip if already processed
+        if self.store.contains(url):
+            self.record((url, EXTRACTED, None))
+            item['processed'] = True
+            return item
+        
+        finished = Deferred()
+        
+        def release(processed):
+            if not finished.called:
+                item['processed'] = processed
+                finished.callback(item)
+        
+        def timed_out():
+            logging.error(f"Timed out after {self.timeout}s extracting {url}; its outcome is booked when it finishes")
+            release(False)
+        
+        timer = reactor.callLater(self.timeout, timed_out)
+        
+        def done(update):
+            if timer.active():
+                timer.cancel()
+            release(update[1] == EXTRACTED)
+            self.record(update)
+        
+        def failed(failure):
+            if timer.active():
+                timer.cancel()
+            release(False)
+            logging.error(f"Error extracting {url}: {failure.getErrorMessage()}")
+            self.record((url, FAILED, failure.getErrorMessage()))
+        
+        d = threads.deferToThreadPool(reactor, self.threads, extract_and_save, url, self.store, self.cpu,
+                                      self.frontier)
+        d.addCallbacks(done, failed)
+        return finished
+
+# Extract every pending CoinDesk article in the crawl-state store. With a
+# shared queue this process is one worker among several: local discoveries
+# are queued, then URLs are claimed batch by batch under a lease.
+def process_pending(store, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+                    frontier_path=DEFAULT_FRONTIER_PATH, batch_size=STATE_BATCH_SIZE,
+                    processes=DEFAULT_PROCESSES, chunksize=DEFAULT_CHUNKSIZE,
+                    queue=None, worker_id=None, lease_batch=DEFAULT_LEASE_BATCH):
+    frontier = Frontier(frontier_path)
+    
+    # State changes are committed in batches rather than per article
+    updates = []
+    
+    # Stored records are made durable before their EXTRACTED state is committed
+    def flush():
+        if updates:
+            store.flush()
+            frontier.update_many(updates)
+            updates.clear()
+    
+    # Work out which articles still need extracting
+    pending = []
+    for url in frontier.pending(SOURCE):
+        # Skip if already processed
+        if store.contains(url):
+            updates.append((url, EXTRACTED, None))
+            continue
+        
+        pending.append(url)
+    flush()
+    
+    # Successful downloads are recorded as FETCHED as they happen
+    def fetch(url):
+        fetched = fetch_article(url)
+        if fetched is not None:
+            frontier.mark_fetched(url)
+        return fetched
+    
+    def extract(urls, on_result):
+        if processes > 0:
+            # Fetch on threads, parse on the process pool
+            return run_pipeline(urls, fetch, parse_article, max_workers=workers, timeout=timeout,
+                                processes=processes, chunksize=chunksize, on_result=on_result)
+        return run_extractions(urls, lambda url: extract_content(url, frontier), max_workers=workers,
+                               timeout=timeout, on_result=on_result)
+    
+    def save_result(index, url, content):
+        updates.append(save_article(url, content, store))
+        if len(updates) >= batch_size:
+            flush()
+    
+    # Outcomes of one leased batch, booked through the queue rather than the frontier
+    def process_batch(urls):
+        outcomes = [(url, EXTRACTED, None) for url in urls if store.contains(url)]
+        todo = [url for url in urls if not store.contains(url)]
+        extract(todo, lambda index, url, content: outcomes.append(save_article(url, content, store)))
+        store.flush()
+        return outcomes
+    
+    try:
+        if queue is not None:
+            queue.enqueue(pending, SOURCE)
+            results = run_worker(queue, SOURCE, process_batch, worker=worker_id, batch_size=lease_batch)
+        else:
+            results = extract(pending, save_result)
+    finally:
+        store.flush()
+        flush()
+        logging.info(f"Crawl state: {frontier.counts(SOURCE)}")
+        frontier.close()
+    
+    return results
 
 if __name__ == "__main__":
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        handlers=[
-            logging.FileHandler('spider.log'),
-            logging.StreamHandler()
-        ]
-    )
+    parser = argparse.ArgumentParser(description='Crawl and extract CoinDesk articles')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of articles extracted in parallel')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='seconds allowed per article before giving up')
+    parser.add_argument('--state', default=DEFAULT_FRONTIER_PATH,
+                        help='crawl-state database')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip discovery and only extract pending articles')
+    parser.add_argument('--discovery', choices=['feeds', 'homepage', 'both'], default='both',
+                        help='find new articles through sitemaps/RSS, the homepage crawl, or both')
+    parser.add_argument('--full-discovery', action='store_true',
+                        help='read every feed entry instead of only those since the last run')
+    parser.add_argument('--import-file', action='append', default=[],
+                        help='load a legacy articles_{date}.json into the crawl-state store')
+    parser.add_argument('--storage', choices=['files', 'segments'], default=DEFAULT_STORAGE,
+                        help='one JSON file per article, or compressed append-only segments')
+    parser.add_argument('--stream', action='store_true',
+                        help='extract articles while the spider is still discovering them')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='parser processes for the CPU-bound extraction stage (0 parses on the fetch threads)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='fetched pages handed to a parser process at a time')
+    parser.add_argument('--http-cache', default=DEFAULT_CACHE_DIR,
+                        help='directory for the conditional-request HTTP cache')
+    parser.add_argument('--no-http-cache', action='store_true',
+                        help='always download pages in full')
+    parser.add_argument('--listing-ttl', type=float, default=DEFAULT_LISTING_TTL,
+                        help='seconds a cached listing page is used without revalidating')
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR,
+                        help='directory for the raw HTML archive')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='do not keep the raw HTML of fetched articles')
+    parser.add_argument('--queue', default=None,
+                        help="share the work with other workers through a lease queue: 'sqlite' or a redis:// URL")
+    parser.add_argument('--worker-id', default=None,
+                        help='name of this worker in the queue (default: host-pid)')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help='seconds a claimed batch stays leased without a heartbeat')
+    parser.add_argument('--lease-batch', type=int, default=DEFAULT_LEASE_BATCH,
+                        help='articles claimed from the queue at a time')
+    parser.add_argument('--metrics-file', default=None,
+                        help='write the per-stage timing summary here as JSON when the run ends')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve Prometheus-style metrics on this port while running')
+    parser.add_argument('--log-level', default='INFO', help='default log level')
+    parser.add_argument('--log-modules', default=None,
+                        help='per-module levels, e.g. scrape_coindesk=DEBUG,scrapy=WARNING')
+    parser.add_argument('--log-file', default='spider.log', help="log file ('' for console only)")
+    parser.add_argument('--log-json', action='store_true', help='write log records as JSON lines')
+    parser.add_argument('--debug-rate', type=int, default=DEFAULT_DEBUG_RATE,
+                        help='DEBUG records per second allowed from any one log call (0 for no limit)')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default='flag',
+                        help='near-duplicates of stored articles: flag them, skip them, or store as usual (off)')
+    parser.add_argument('--dedup-index', default=DEFAULT_DEDUP_PATH,
+                        help='fingerprint database, shared with the Cointelegraph spider')
+    args = parser.parse_args()
+    if args.queue and args.stream:
+        parser.error('--stream extracts outside the queue; use --queue without it')
+    
+    # One pooled connection per extraction worker
+    http_client.configure_session(pool_maxsize=args.workers)
+    
+    # Records are written by a listener thread, off the fetch and parse path
+    try:
+        configure_logging(args.log_level, log_file=args.log_file or None, json_lines=args.log_json,
+                          module_levels=parse_module_levels(args.log_modules), debug_rate=args.debug_rate)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    
+    # Before any article store is opened, so every one of them checks for duplicates
+    configure_dedup(args.dedup_index, args.dedup)
+    
+    # Article fetches are paced per domain and adapt to how the server responds
+    http_client.configure_rate_control(RateController())
     
-    # Run the spider
-    logging.info("Starting spider...")
-    process = CrawlerProcess()
-    process.crawl(GeneralSpider)
-    process.start()
+    if not args.no_http_cache:
+        http_client.configure_cache(args.http_cache, listing_ttl=args.listing_ttl)
     
-    # Process articles
-    today = datetime.now().strftime('%Y-%m-%d')
-    articles_file = f'articles_{today}.json'
-    output_dir = "extracted_articles/coindesk"
+    if not args.no_archive:
+        configure_archive(args.archive_dir, prefix=SOURCE)
     
-    # Create output directory structure
-    os.makedirs(output_dir, exist_ok=True)
+    if args.import_file:
+        frontier = Frontier(args.state)
+        for path in args.import_file:
+            count = frontier.import_articles_file(path, SOURCE)
+            logging.info(f"Imported {count} URLs from {path}")
+        frontier.close()
     
-    # Track processed URLs
-    processed_urls = set()
+    if not args.resume and args.discovery in ('feeds', 'both'):
+        frontier = Frontier(args.state)
+        try:
+            discover(SOURCE, frontier, full=args.full_discovery)
+        finally:
+            frontier.close()
+    
+    if not args.resume and args.discovery in ('homepage', 'both'):
+        # Run the spider
+        logging.info("Starting spider...")
+        settings = {
+            'RATE_CONTROL_ENABLED': True,
+            'DOWNLOADER_MIDDLEWARES': {'rate_control.AdaptiveRateMiddleware': 950},
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 16,
+        }
+        if not args.no_http_cache:
+            settings.update(scrapy_cache_settings(args.http_cache, listing_ttl=args.listing_ttl))
+        if args.stream:
+            settings.update({
+                'ITEM_PIPELINES': {'scrape_coindesk.StreamingExtractionPipeline': 300},
+                'EXTRACTION_STORAGE': args.storage,
+                'EXTRACTION_WORKERS': args.workers,
+                'EXTRACTION_TIMEOUT': args.timeout,
+                'EXTRACTION_PROCESSES': args.processes,
+                'CRAWL_STATE_PATH': args.state,
+                # Items in flight per response; beyond this discovery waits for extraction
+                'CONCURRENT_ITEMS': args.workers * 2,
+            })
+        # Scrapy's own root handler would bypass the log queue, and it resets the levels
+        process = CrawlerProcess(settings=settings, install_root_handler=False)
+        apply_levels()
+        process.crawl(GeneralSpider, frontier_path=args.state)
+        process.start()
+    
+    # Process articles (in streaming mode only leftovers and retries remain)
+    store = open_article_store(args.storage)
+    queue = open_queue(args.queue, args.state, lease_seconds=args.lease_seconds) if args.queue else None
     
-    # Read and process articles
     try:
-        with open(articles_file, 'r') as f:
-            articles = [json.loads(line) for line in f]
-        
-        # Update articles with processing status
-        for article in articles:
-            url = article['url']
-            if url in processed_urls:
-                continue
-                
-            # Create filename using datetime and article name
-            url_parts = url.rstrip('/').split('/')
-            date_str = f"{url_parts[-4]}-{url_parts[-3]}-{url_parts[-2]}"
-            article_name = url_parts[-1]
-            filename = f"{date_str}_{article_name}.json"
-            output_path = os.path.join(output_dir, filename)
-            
-            # Skip if already processed
-            if os.path.exists(output_path):
-                processed_urls.add(url)
-                continue
-            
-            logging.info(f"Processing article: {url}")
-            content = extract_content(url)
-            
-            if content:
-                try:
-                    with open(output_path, 'w', encoding='utf-8') as outfile:
-                        json.dump(content, outfile, ensure_ascii=False, indent=2)
-                    logging.info(f"Saved content to {output_path}")
-                    processed_urls.add(url)
-                except IOError as e:
-                    logging.error(f"Error saving content to {output_path}: {str(e)}")
-            else:
-                logging.error(f"Failed to extract content from {url}")
-        
-        # Update the articles file with processed status
-        with open(articles_file, 'w') as f:
-            for article in articles:
-                article['processed'] = article['url'] in processed_urls
-                json.dump(article, f)
-                f.write('\n')
-                
+        process_pending(store, workers=args.workers, timeout=args.timeout, frontier_path=args.state,
+                        processes=args.processes, chunksize=args.chunksize,
+                        queue=queue, worker_id=args.worker_id, lease_batch=args.lease_batch)
     except Exception as e:
         logging.error(f"Error processing articles: {str(e)}")
         logging.error(traceback.format_exc())
+    finally:
+        store.close()
+        if queue is not None:
+            queue.close()
+        close_archive()
+        close_dedup()
+        logging.info(f"Stage metrics: {json.dumps(metrics.summary())}")
+        if args.metrics_file:
+            write_summary(args.metrics_file)
+        close_metrics_server()
+        logging.info(f"Rate control (articles): {json.dumps(http_client.rate_control_stats())}")
+        if not args.no_http_cache:
+            logging.info(f"HTTP cache (articles): {json.dumps(http_client.cache_stats())}")
+            http_client.close_cache()
@@ -0,0 +1,252 @@
+import json
+import threading
+
+import pytest
+
+from coordination import SqliteLeaseQueue, RedisLeaseQueue, run_worker
+from frontier import canonicalize_url, EXTRACTED, FAILED, MAX_ATTEMPTS
+
+LEASE_SECONDS = 60
+URLS = [f'https://www.coindesk.com/markets/2024/05/0{day}/story-{day}/' for day in range(1, 5)]
+
+
+class WatchError(Exception):
+    pass
+
+
+# In-process stand-in for the part of the redis-py API the queue uses,
+# including WATCH/MULTI transactions through client.transaction()
+class LocalRedis:
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.lock = threading.RLock()
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def hsetnx(self, key, field, value):
+        fields = self.data.setdefault(key, {})
+        if field in fields:
+            return 0
+        fields[field] = value
+        self._touch(key)
+        return 1
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        self.data.setdefault(key, {}).update({name: str(v) for name, v in values.items()})
+        self._touch(key)
+        return len(values)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        values = self.data.get(key, {})
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        self._touch(key)
+        return removed
+
+    def hlen(self, key):
+        return len(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        self._touch(key)
+        return len(items)
+
+    def lpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        self._touch(key)
+        return len(items)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.lrange(key, start, end)
+        self._touch(key)
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def zadd(self, key, mapping, xx=False):
+        scores = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in scores:
+                scores[member] = float(score)
+        self._touch(key)
+
+    def zrem(self, key, *members):
+        scores = self.data.get(key, {})
+        for member in members:
+            scores.pop(member, None)
+        self._touch(key)
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(member)
+
+    def zrangebyscore(self, key, low, high):
+        low, high = float(low), float(high)
+        members = sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+        return [member for member, score in members if low <= score <= high]
+
+    def zcount(self, key, low, high):
+        return len(self.zrangebyscore(key, low, high))
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        while True:
+            with self.lock:
+                pipe = LocalPipeline(self, {key: self.versions.get(key, 0) for key in watches})
+                value = func(pipe)
+                try:
+                    results = pipe.execute()
+                except WatchError:
+                    continue
+            return value if value_from_callable else results
+
+    def close(self):
+        pass
+
+
+# Commands run straight away while watching, and are queued after multi()
+# or on a plain pipeline
+class LocalPipeline:
+    def __init__(self, client, watched=None):
+        self.client = client
+        self.watched = watched or {}
+        self.queued = None if watched else []
+
+    def multi(self):
+        self.queued = []
+
+    def execute(self):
+        for key, version in self.watched.items():
+            if self.client.versions.get(key, 0) != version:
+                raise WatchError(key)
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.queued or []]
+        self.queued = []
+        return results
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            if self.queued is None:
+                return command(*args, **kwargs)
+            self.queued.append((name, args, kwargs))
+            return self
+        return call
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('time.time', clock)
+    return clock
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def queue(request, tmp_path, clock):
+    if request.param == 'sqlite':
+        queue = SqliteLeaseQueue(str(tmp_path / 'crawl_state.db'), lease_seconds=LEASE_SECONDS)
+    else:
+        queue = RedisLeaseQueue(LocalRedis(), lease_seconds=LEASE_SECONDS)
+    queue.enqueue(URLS, 'coindesk')
+    yield queue
+    queue.close()
+
+
+# (state, attempts) booked for `url`
+def booked(queue, url):
+    key = canonicalize_url(url)
+    if isinstance(queue, SqliteLeaseQueue):
+        return tuple(queue._row(key))
+    record = json.loads(queue.client.hget(queue.states_key, key))
+    return record['state'], record['attempts']
+
+
+def test_claimed_urls_are_not_claimed_twice(queue):
+    first = queue.claim('a', 'coindesk', limit=2)
+    second = queue.claim('b', 'coindesk', limit=10)
+    assert len(first) == 2
+    assert sorted(first.urls + second.urls) == sorted(URLS)
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    lease = queue.claim('a', 'coindesk', limit=2)
+    clock.now += LEASE_SECONDS + 1
+    reclaimed = queue.claim('b', 'coindesk', limit=10)
+    assert set(lease.urls) <= set(reclaimed.urls)
+
+
+def test_heartbeat_keeps_the_lease(queue, clock):
+    lease = queue.claim('a', 'coindesk', limit=2)
+    clock.now += LEASE_SECONDS - 1
+    assert queue.heartbeat(lease) == 2
+    clock.now += LEASE_SECONDS - 1
+    other = queue.claim('b', 'coindesk', limit=10)
+    assert not set(lease.urls) & set(other.urls)
+
+
+def test_late_result_is_rejected(queue, clock):
+    slow = queue.claim('a', 'coindesk', limit=1)
+    url = slow.urls[0]
+    clock.now += LEASE_SECONDS + 1
+    fast = queue.claim('b', 'coindesk', limit=1)
+    assert fast.urls == [url]
+
+    assert queue.complete(fast, [(url, EXTRACTED, None)]) == [(url, EXTRACTED, None)]
+    assert queue.complete(slow, [(url, FAILED, 'timed out')]) == []
+    assert booked(queue, url) == (EXTRACTED, 1)
+
+
+def test_result_is_booked_once(queue):
+    lease = queue.claim('a', 'coindesk', limit=1)
+    url = lease.urls[0]
+    assert queue.complete(lease, [(url, EXTRACTED, None)])
+    assert queue.complete(lease, [(url, EXTRACTED, None)]) == []
+    assert booked(queue, url) == (EXTRACTED, 1)
+
+
+def test_released_urls_can_be_claimed_again(queue):
+    lease = queue.claim('a', 'coindesk', limit=2)
+    queue.release(lease)
+    other = queue.claim('b', 'coindesk', limit=10)
+    assert set(lease.urls) <= set(other.urls)
+
+
+def test_run_worker_books_missing_outcomes_as_failed(queue):
+    batches = []
+
+    # Reports nothing for the first URL of every batch, as when saving it
+    # raised an error the extraction stage swallowed
+    def process_batch(urls):
+        batches.append(urls)
+        return [(url, EXTRACTED, None) for url in urls[1:]]
+
+    totals = run_worker(queue, 'coindesk', process_batch, worker='a', batch_size=len(URLS))
+    assert totals['batches'] <= MAX_ATTEMPTS
+    assert booked(queue, batches[0][0]) == (FAILED, MAX_ATTEMPTS)
+    assert all(booked(queue, url)[0] == EXTRACTED for url in batches[0][1:])
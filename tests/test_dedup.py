@@ -0,0 +1,194 @@
+import random
+import sqlite3
+
+import pytest
+
+from dedup import (
+    DuplicateIndex, DedupStore, simhash, hamming, _signed, DEFAULT_MAX_DISTANCE, FINGERPRINT_BITS
+)
+
+ORIGINAL_URL = 'https://www.coindesk.com/markets/2024/05/01/bitcoin-falls-below-60k/'
+COPY_URL = 'https://cointelegraph.com/news/bitcoin-drops-under-60k-etf-outflows'
+
+ARTICLE = [
+    "Bitcoin fell below $60,000 on Wednesday for the first time since late February as traders pulled money "
+    "out of spot exchange-traded funds and the Federal Reserve signalled it was in no hurry to cut interest rates.",
+    "The largest cryptocurrency by market value dropped as much as 6% to $59,200 during Asian trading hours before "
+    "recovering slightly to trade around $60,100, according to CoinDesk Indices data. Ether, the second-largest "
+    "token, slid 5% to $2,900.",
+    "Outflows from U.S. spot bitcoin ETFs reached $563 million on Tuesday, the largest single-day withdrawal since "
+    "the products began trading in January, data compiled by Farside Investors show. Grayscale's GBTC alone lost "
+    "$167 million while Fidelity's FBTC saw redemptions of $191 million.",
+    '"The market is digesting a lot of supply at the moment," said a strategist at a digital asset trading firm '
+    'in Singapore. "Miners are selling after the halving cut their rewards, and the ETF bid that carried prices '
+    'through March has clearly faded."',
+    "The Federal Reserve held its benchmark rate steady at a range of 5.25% to 5.5% and chair Jerome Powell said "
+    "policymakers needed greater confidence that inflation was moving sustainably toward the 2% target before "
+    "easing. Higher rates for longer tend to weigh on speculative assets including cryptocurrencies.",
+    "Derivatives markets showed signs of stress. More than $400 million of leveraged long positions were "
+    "liquidated across major exchanges in the past 24 hours, according to CoinGlass. Funding rates on perpetual "
+    "futures turned negative on several venues, indicating that traders were paying to hold short positions.",
+    "Some analysts said the pullback was a healthy reset after a rally that took bitcoin to a record above "
+    "$73,000 in March. On-chain data show long-term holders have not been selling in large amounts, and the "
+    "number of addresses holding at least one bitcoin continued to grow during April.",
+    "Still, the options market priced in further downside. Put options at the $55,000 strike expiring at the end "
+    "of May saw heavy demand on Deribit, the largest crypto options exchange, and the one-week implied volatility "
+    "rose to its highest level in a month.",
+]
+
+UNRELATED = [
+    "The Ethereum Foundation published a roadmap for the next network upgrade on Thursday, setting out changes "
+    "that developers expect to ship before the end of the year.",
+    "The upgrade introduces account abstraction, which lets wallets pay fees in tokens other than ether and "
+    "recover keys through trusted contacts, and lowers the cost of posting data for layer-2 rollups.",
+    "Client teams will run the changes on two test networks over the summer. Core developers said a mainnet "
+    "date would only be set once both forks had run for several weeks without consensus failures.",
+    "Staking providers welcomed the plan but asked for a longer notice period, saying validators need time to "
+    "update their software and that the last upgrade caught several smaller operators out.",
+]
+
+
+def edited(*edits):
+    paragraphs = list(ARTICLE)
+    for edit in edits:
+        paragraphs = edit(paragraphs)
+    return '\n'.join(paragraphs)
+
+
+def updated_figures(paragraphs):
+    paragraphs[1] = paragraphs[1].replace('6%', '7%').replace('$59,200', '$58,900').replace('$60,100', '$59,800')
+    paragraphs[2] = paragraphs[2].replace('$563', '$564')
+    return paragraphs
+
+
+def attribution(paragraphs):
+    return paragraphs + ["This article was originally published by CoinDesk. Republished with permission. "
+                         "Follow us on X and Telegram for the latest market news."]
+
+
+def trimmed_ending(paragraphs):
+    return paragraphs[:-1]
+
+
+def cut_paragraph(paragraphs):
+    paragraphs = paragraphs[:5] + paragraphs[6:]
+    paragraphs[0] = 'UPDATED: ' + paragraphs[0]
+    return paragraphs
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'))
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize('edits', [
+    (updated_figures,),
+    (attribution,),
+    (trimmed_ending,),
+    (cut_paragraph,),
+    (updated_figures, attribution),
+    (updated_figures, cut_paragraph),
+])
+def test_edited_copy_is_found(index, edits):
+    assert index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE)) is None
+    match = index.check(COPY_URL, 'cointelegraph', edited(*edits))
+    assert match is not None
+    assert match[0] == ORIGINAL_URL
+    assert match[1] <= DEFAULT_MAX_DISTANCE
+
+
+def test_larger_max_distance_finds_heavier_edits(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'), max_distance=11)
+    try:
+        index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+        match = index.check(COPY_URL, 'cointelegraph', edited(updated_figures, trimmed_ending))
+        assert match is not None and match[0] == ORIGINAL_URL
+    finally:
+        index.close()
+
+
+def test_unrelated_article_is_not_a_duplicate(index):
+    index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+    assert index.check(COPY_URL, 'cointelegraph', '\n'.join(UNRELATED * 2)) is None
+
+
+def test_saving_an_article_again_is_not_a_duplicate(index):
+    index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+    assert index.check(ORIGINAL_URL.replace('www.', ''), 'coindesk', edited(updated_figures)) is None
+
+
+def test_copy_of_a_copy_points_at_the_original(index):
+    index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+    index.check(COPY_URL, 'cointelegraph', edited(attribution))
+    match = index.check(COPY_URL + '-2', 'cointelegraph', edited(attribution, trimmed_ending))
+    assert match[0] == ORIGINAL_URL
+
+
+# The band probes must find every fingerprint within max_distance, however
+# the differing bits fall across the bands
+@pytest.mark.parametrize('max_distance', [3, 7, 11])
+def test_band_probes_find_every_match(tmp_path, max_distance):
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'), max_distance=max_distance)
+    rng = random.Random(max_distance)
+    try:
+        for _ in range(200):
+            fingerprint = rng.getrandbits(FINGERPRINT_BITS)
+            flipped = 0
+            for bit in rng.sample(range(FINGERPRINT_BITS), max_distance):
+                flipped |= 1 << bit
+            index._conn.execute(index._insert_sql, ('a', 'https://a', 'coindesk', _signed(fingerprint ^ flipped), None, 0))
+            assert index.find(fingerprint) == ('https://a', max_distance)
+    finally:
+        index.close()
+
+
+# Fingerprints added through another connection, as by another process
+def test_other_writers_are_seen(tmp_path, index):
+    other = DuplicateIndex(index.path)
+    try:
+        other.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+    finally:
+        other.close()
+    assert index.check(COPY_URL, 'cointelegraph', edited(attribution))[0] == ORIGINAL_URL
+
+
+def test_database_with_band_columns_is_migrated(tmp_path):
+    path = str(tmp_path / 'fingerprints.db')
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE fingerprints (
+            url TEXT PRIMARY KEY, source TEXT, simhash INTEGER NOT NULL,
+            band0 INTEGER NOT NULL, band1 INTEGER NOT NULL, band2 INTEGER NOT NULL, band3 INTEGER NOT NULL,
+            duplicate_of TEXT, added REAL NOT NULL
+        )
+    """)
+    conn.execute('INSERT INTO fingerprints VALUES (?, ?, ?, 0, 0, 0, 0, NULL, 0)',
+                 ('coindesk.com/markets/2024/05/01/bitcoin-falls-below-60k', 'coindesk',
+                  _signed(simhash('\n'.join(ARTICLE)))))
+    conn.commit()
+    conn.close()
+
+    index = DuplicateIndex(path)
+    try:
+        match = index.check(COPY_URL, 'cointelegraph', edited(attribution))
+        assert match[0] == 'coindesk.com/markets/2024/05/01/bitcoin-falls-below-60k'
+    finally:
+        index.close()
+
+
+def test_flagged_copy_records_the_original_url(index):
+    saved = {}
+
+    class Store:
+        def save(self, url, record, filename=None):
+            saved[url] = record
+            return url
+
+    store = DedupStore(Store(), index, 'cointelegraph', mode='flag')
+    index.check(ORIGINAL_URL, 'coindesk', '\n'.join(ARTICLE))
+    store.save(COPY_URL, {'content': edited(attribution)})
+    assert saved[COPY_URL]['duplicate_of'] == ORIGINAL_URL
+    assert saved[COPY_URL]['duplicate_distance'] == hamming(simhash('\n'.join(ARTICLE)),
+                                                            simhash(edited(attribution)))
@@ -0,0 +1,67 @@
+import os
+import random
+import time
+
+import pytest
+
+from dedup import DuplicateIndex, FINGERPRINT_BITS, DEFAULT_MAX_DISTANCE, _signed
+
+# Lookup latency with a realistically sized index. Building it takes a
+# while, so it only runs when asked for:
+#
+#     DEDUP_BENCHMARK_ROWS=1000000 python -m pytest -q -s tests/test_dedup_benchmark.py
+ROWS = int(os.environ.get('DEDUP_BENCHMARK_ROWS', 0))
+LOOKUPS = 2000
+# Target for one lookup (without fingerprinting the text) at millions of articles
+TARGET_P50_MS = 1.0
+
+pytestmark = pytest.mark.skipif(not ROWS, reason='set DEDUP_BENCHMARK_ROWS to run')
+
+
+def _percentile(timings, fraction):
+    timings = sorted(timings)
+    return 1000 * timings[min(len(timings) - 1, int(fraction * len(timings)))]
+
+
+def test_lookup_latency(tmp_path):
+    rng = random.Random(1)
+    path = str(tmp_path / 'fingerprints.db')
+    index = DuplicateIndex(path)
+    index._conn.execute('BEGIN')
+    index._conn.executemany(index._insert_sql, (
+        (f'example.com/{i}', f'https://example.com/{i}', 'coindesk', _signed(rng.getrandbits(FINGERPRINT_BITS)), None, 0)
+        for i in range(ROWS)
+    ))
+    index._conn.execute('COMMIT')
+    index.close()
+
+    started = time.perf_counter()
+    index = DuplicateIndex(path)
+    load_seconds = time.perf_counter() - started
+    try:
+        misses = []
+        for _ in range(LOOKUPS):
+            fingerprint = rng.getrandbits(FINGERPRINT_BITS)
+            started = time.perf_counter()
+            index.find(fingerprint, exclude_url='example.com/new')
+            misses.append(time.perf_counter() - started)
+
+        # Lookups that do find a near-duplicate also read its row
+        hits = []
+        for i in range(LOOKUPS):
+            stored = index._conn.execute('SELECT simhash FROM fingerprints WHERE id = ?',
+                                         (rng.randint(1, ROWS),)).fetchone()[0]
+            fingerprint = stored % (1 << FINGERPRINT_BITS)
+            for bit in rng.sample(range(FINGERPRINT_BITS), DEFAULT_MAX_DISTANCE):
+                fingerprint ^= 1 << bit
+            started = time.perf_counter()
+            assert index.find(fingerprint) is not None
+            hits.append(time.perf_counter() - started)
+    finally:
+        index.close()
+
+    print(f"\n{ROWS} fingerprints, loaded in {load_seconds:.1f}s")
+    print(f"find (no match): p50 {_percentile(misses, 0.5):.3f} ms, p95 {_percentile(misses, 0.95):.3f} ms")
+    print(f"find (match):    p50 {_percentile(hits, 0.5):.3f} ms, p95 {_percentile(hits, 0.95):.3f} ms")
+    assert _percentile(misses, 0.5) < TARGET_P50_MS
+    assert _percentile(hits, 0.5) < TARGET_P50_MS
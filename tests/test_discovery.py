@@ -0,0 +1,83 @@
+import io
+from datetime import datetime, timezone
+
+from discovery import iter_feed_entries, is_article_url
+
+NEWS_SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url>
+    <loc>https://www.coindesk.com/markets/2024/05/01/bitcoin-slides-below-60k/</loc>
+    <news:news>
+      <news:publication>
+        <news:name>CoinDesk</news:name>
+        <news:language>en</news:language>
+      </news:publication>
+      <news:publication_date>2024-05-01T09:15:00Z</news:publication_date>
+      <news:title>Bitcoin Slides Below $60K</news:title>
+    </news:news>
+    <image:image>
+      <image:loc>https://www.coindesk.com/resizer/abc123/bitcoin.jpg</image:loc>
+    </image:image>
+  </url>
+  <url>
+    <image:image>
+      <image:loc>https://www.coindesk.com/resizer/def456/ether.jpg</image:loc>
+    </image:image>
+    <loc>https://www.coindesk.com/tech/2024/05/02/ether-upgrade/</loc>
+    <lastmod>2024-05-02T10:00:00+00:00</lastmod>
+  </url>
+</urlset>
+"""
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap>
+    <loc>https://www.coindesk.com/arc/outboundfeeds/news-sitemap/?outputType=xml&amp;from=0</loc>
+    <lastmod>2024-05-02T10:00:00Z</lastmod>
+  </sitemap>
+</sitemapindex>
+"""
+
+RSS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">
+  <channel>
+    <link>https://cointelegraph.com</link>
+    <item>
+      <title>Ether ETF inflows</title>
+      <link>https://cointelegraph.com/news/ether-etf-inflows</link>
+      <media:content url="https://images.cointelegraph.com/ether.jpg"/>
+      <pubDate>Thu, 02 May 2024 10:00:00 +0000</pubDate>
+    </item>
+  </channel>
+</rss>
+"""
+
+
+def entries(document):
+    return list(iter_feed_entries(io.BytesIO(document)))
+
+
+def test_news_sitemap_keeps_article_url_over_image_loc():
+    assert entries(NEWS_SITEMAP) == [
+        ('page', 'https://www.coindesk.com/markets/2024/05/01/bitcoin-slides-below-60k/',
+         datetime(2024, 5, 1, 9, 15, tzinfo=timezone.utc)),
+        ('page', 'https://www.coindesk.com/tech/2024/05/02/ether-upgrade/',
+         datetime(2024, 5, 2, 10, 0, tzinfo=timezone.utc)),
+    ]
+    assert all(is_article_url('coindesk', url) for _, url, _ in entries(NEWS_SITEMAP))
+
+
+def test_sitemap_index_children():
+    assert entries(SITEMAP_INDEX) == [
+        ('sitemap', 'https://www.coindesk.com/arc/outboundfeeds/news-sitemap/?outputType=xml&from=0',
+         datetime(2024, 5, 2, 10, 0, tzinfo=timezone.utc)),
+    ]
+
+
+def test_rss_item_link():
+    assert entries(RSS) == [
+        ('page', 'https://cointelegraph.com/news/ether-etf-inflows',
+         datetime(2024, 5, 2, 10, 0, tzinfo=timezone.utc)),
+    ]
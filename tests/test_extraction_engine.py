@@ -0,0 +1,16 @@
+import time
+
+from extraction_engine import _parse_chunk
+
+
+def parse(url, payload):
+    if payload == 'slow':
+        time.sleep(5)
+    return payload.upper()
+
+
+def test_slow_page_times_out_without_holding_up_the_chunk():
+    started = time.monotonic()
+    results, _ = _parse_chunk(parse, [('a', 'fast'), ('b', 'slow'), ('c', 'fast')], timeout=0.2)
+    assert results == ['FAST', None, 'FAST']
+    assert time.monotonic() - started < 2